@@ -1,18 +1,71 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from rest_framework import exceptions
-from .redis_service import is_access_token_whitelisted
+from .cache import aget_user, get_user
+from .redis_service import ais_access_token_whitelisted, is_access_token_whitelisted
+
+
+def _user_id(validated_token):
+    try:
+        return validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+
+def _check_user(user, validated_token):
+    if user is None:
+        raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+    if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+    if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+        jwt_settings.REVOKE_TOKEN_CLAIM
+    ) != get_md5_hash_password(user.password):
+        raise exceptions.AuthenticationFailed(
+            "The user's password has been changed.", code="password_changed"
+        )
+    return user
+
 
 class RedisJWTAuthentication(JWTAuthentication):
-    def authenticate(self, request):
-        validated = super().authenticate(request)
+    def get_user(self, validated_token):
+        # Cached in Redis (accounts.cache) instead of one SELECT per request.
+        return _check_user(get_user(_user_id(validated_token)), validated_token)
 
-        if validated is None:
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
             return None
 
-        user, token = validated
-        token_str = request.headers.get("Authorization", "").split(" ")[1]
-
-        if not is_access_token_whitelisted(token_str):
+        # Whitelist first, so revoked tokens never reach the user lookup.
+        token = self.get_validated_token(raw_token)
+        if not is_access_token_whitelisted(token):
             raise exceptions.AuthenticationFailed("Token not whitelisted")
 
-        return user, token
+        return self.get_user(token), token
+
+
+async def authenticate_async(request):
+    """
+    RedisJWTAuthentication for async views: same header, token and whitelist
+    checks, with the whitelist and user lookups done without blocking the
+    event loop. Returns ``(user, token)`` or None when no token was sent.
+    """
+    authentication = RedisJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    token = authentication.get_validated_token(raw_token)
+    if not await ais_access_token_whitelisted(token):
+        raise exceptions.AuthenticationFailed("Token not whitelisted")
+
+    user = await aget_user(_user_id(token))
+    return _check_user(user, token), token
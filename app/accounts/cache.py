@@ -0,0 +1,74 @@
+import functools
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from core.async_redis import cache_get, cache_set
+
+
+@functools.cache
+def _cached_fields():
+    # The password hash never goes to Redis: it stays deferred on cached
+    # users and is loaded on first access, and save() then leaves it alone.
+    return tuple(
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname != "password"
+    )
+
+
+@functools.cache
+def _schema_version():
+    # Entries written before Account gained or lost a column are never read.
+    return hashlib.sha256(",".join(_cached_fields()).encode()).hexdigest()[:8]
+
+
+def _key(user_id):
+    return f"accounts:user:{_schema_version()}:{{{user_id}}}"
+
+
+def _from_values(values):
+    return get_user_model().from_db("default", _cached_fields(), values)
+
+
+def _row(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list(*_cached_fields())
+
+
+def get_user(user_id):
+    """
+    Account ``user_id`` from the cache or the database, or None if it does
+    not exist.
+    """
+    values = cache.get(_key(user_id))
+    if values is None:
+        values = _row(user_id).first()
+        if values is None:
+            return None
+        cache.set(_key(user_id), values, settings.ACCOUNT_CACHE_TIMEOUT)
+    return _from_values(values)
+
+
+async def aget_user(user_id):
+    values = await cache_get(_key(user_id))
+    if values is None:
+        values = await _row(user_id).afirst()
+        if values is None:
+            return None
+        await cache_set(_key(user_id), values, settings.ACCOUNT_CACHE_TIMEOUT)
+    return _from_values(values)
+
+
+def invalidate_users(user_ids):
+    """
+    Drop cached accounts now and again once the current transaction
+    commits, so a concurrent request cannot cache the pre-commit row. Saves,
+    deletes and queryset updates of Account call this; code writing
+    accounts with raw SQL must call it too.
+    """
+    keys = [_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
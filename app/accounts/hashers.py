@@ -0,0 +1,71 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PasswordHashingBusy(Exception):
+    """
+    PASSWORD_HASH_QUEUE_SIZE hashes are already waiting for the pool.
+    accounts.middleware turns it into a 503 with Retry-After.
+    """
+
+
+_executor = None
+_slots = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _slots, _pid
+    # Worker threads do not survive a fork; start a pool per process.
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                workers = settings.PASSWORD_HASH_WORKERS
+                _executor = ThreadPoolExecutor(workers, thread_name_prefix="password-hashing")
+                _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE_SIZE)
+                _pid = os.getpid()
+    return _executor, _slots
+
+
+def run_hashing(func, *args):
+    """
+    Run ``func(*args)`` on the password-hashing executor and wait for it;
+    raise PasswordHashingBusy at once if PASSWORD_HASH_QUEUE_SIZE calls are
+    already waiting. Runs inline when PASSWORD_HASH_WORKERS is 0.
+
+    The calling thread is blocked for the whole hash either way: the pool
+    bounds how many hashes run at once, and so the CPU they take from
+    other requests, but does not free request threads.
+    """
+    if not settings.PASSWORD_HASH_WORKERS:
+        return func(*args)
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher, with the cost from PASSWORD_HASH_ITERATIONS and
+    every derivation run through run_hashing. The algorithm name is
+    unchanged, so existing hashes still verify and Django re-hashes ones
+    with a different cost on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        return run_hashing(super().encode, password, salt, iterations)
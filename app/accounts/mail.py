@@ -0,0 +1,151 @@
+import json
+import logging
+import smtplib
+import uuid
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django_redis import get_redis_connection
+from kombu.exceptions import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# One hash tag, so LMOVE between the lists also works on Redis Cluster.
+OUTBOX_KEY = "{accounts:mail}:outbox"
+# Messages taken by the running drain; put back in the outbox if it dies.
+PROCESSING_KEY = "{accounts:mail}:processing"
+FAILED_KEY = "{accounts:mail}:failed"
+DRAIN_LOCK_KEY = "{accounts:mail}:drain-lock"
+
+# Only touch the lock while it still holds this drain's token.
+_REFRESH_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Refused by the server for this message only. A 4xx reply, or anything
+# else (connection lost, timeouts), leaves the message queued for the next
+# drain. So does a refused sender: that is a configuration problem (e.g.
+# DEFAULT_FROM_EMAIL) that would refuse every message, so it stops the drain.
+_REFUSED = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPDataError,
+)
+
+
+def _permanent(error) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return error.smtp_code >= 500
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    """
+    Queue a plain-text email (send_mail's arguments) and return at once;
+    accounts.tasks.send_queued_mail delivers it.
+    """
+    from .tasks import send_queued_mail
+
+    _redis().rpush(OUTBOX_KEY, json.dumps({
+        "subject": subject,
+        "body": message,
+        "from_email": from_email or settings.DEFAULT_FROM_EMAIL,
+        "to": list(recipient_list),
+    }))
+    try:
+        send_queued_mail.delay()
+    except OperationalError:
+        # The message is queued; the periodic send_queued_mail picks it up.
+        logger.exception("Could not schedule send_queued_mail")
+
+
+def drain_outbox() -> int:
+    """
+    Send queued mail until the outbox is empty. Only one drain runs at a
+    time; a call that finds another one running returns at once, and the
+    running one checks for late arrivals after letting go of the lock.
+    Returns the number of messages sent.
+    """
+    client = _redis()
+    sent = 0
+    while client.llen(OUTBOX_KEY):
+        token = uuid.uuid4().hex
+        if not client.set(DRAIN_LOCK_KEY, token, nx=True, ex=settings.MAIL_DRAIN_LOCK_TIMEOUT):
+            break
+        try:
+            # Left over by a drain that died midway.
+            _requeue(client)
+            sent += _send_batches(client, token)
+        finally:
+            if _holds_lock(client, token):
+                _requeue(client)
+            client.eval(_RELEASE_LOCK, 1, DRAIN_LOCK_KEY, token)
+    return sent
+
+
+def _holds_lock(client, token) -> bool:
+    # Also extends the lock: it only has to outlive one batch.
+    return bool(client.eval(_REFRESH_LOCK, 1, DRAIN_LOCK_KEY, token,
+                            settings.MAIL_DRAIN_LOCK_TIMEOUT))
+
+
+def _requeue(client):
+    # Back to the head of the outbox, in their original order.
+    while client.lmove(PROCESSING_KEY, OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+        pass
+
+
+def _send_batches(client, token) -> int:
+    # Batches of MAIL_OUTBOX_BATCH_SIZE over one SMTP connection, with one
+    # Redis round trip to take a batch and one to settle it. A batch is
+    # moved to PROCESSING_KEY before it is sent and dropped from there once
+    # handled, so a worker dying midway sends it again rather than losing it.
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    # Opened here, send_messages() reuses it instead of connecting per call.
+    connection.open()
+    try:
+        while _holds_lock(client, token):
+            pipe = client.pipeline(transaction=False)
+            for _ in range(settings.MAIL_OUTBOX_BATCH_SIZE):
+                pipe.lmove(OUTBOX_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+            batch = [raw for raw in pipe.execute() if raw is not None]
+            if not batch:
+                return sent
+            handled = 0
+            failed = []
+            try:
+                for raw in batch:
+                    data = json.loads(raw)
+                    try:
+                        sent += connection.send_messages([EmailMessage(connection=connection, **data)])
+                    except _REFUSED as e:
+                        if not _permanent(e):
+                            raise
+                        logger.exception("Dropping undeliverable mail to %s", data["to"])
+                        failed.append(raw)
+                    handled += 1
+            finally:
+                # Messages after the first unhandled one stay in
+                # PROCESSING_KEY and are put back in the outbox.
+                pipe = client.pipeline(transaction=False)
+                if failed:
+                    pipe.rpush(FAILED_KEY, *failed)
+                pipe.ltrim(PROCESSING_KEY, handled, -1)
+                pipe.execute()
+        # The lock expired and another drain may own the outbox now.
+        logger.warning("Lost the mail drain lock; stopping this drain")
+        return sent
+    finally:
+        connection.close()
@@ -0,0 +1,99 @@
+import statistics
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+import httpx
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.redis_service import remove_all_user_tokens, whitelist_access_token
+
+EMAIL = "hash-bench-{}@example.invalid"
+PASSWORD = "bench-password-1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed traffic through the WSGI app: threads logging in (PBKDF2 on "
+        "every request) next to threads reading /api/accounts/me/. Compares "
+        "hashing on the request threads with the bounded hashing executor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--login-threads", type=int, default=8)
+        parser.add_argument("--read-threads", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode.")
+
+    def handle(self, *args, **options):
+        from django.core.wsgi import get_wsgi_application
+
+        User = get_user_model()
+        users = [User.objects.create_user(EMAIL.format(i), PASSWORD)
+                 for i in range(options["login_threads"])]
+        reader = users[0]
+        token = str(AccessToken.for_user(reader))
+        whitelist_access_token(token, 3600)
+        client = httpx.Client(
+            transport=httpx.WSGITransport(app=get_wsgi_application()),
+            base_url="http://testserver",
+        )
+        workers = settings.PASSWORD_HASH_WORKERS or 2
+        try:
+            for mode, hash_workers in (("request threads", 0), (f"executor x{workers}", workers)):
+                settings.PASSWORD_HASH_WORKERS = hash_workers
+                self.stdout.write(f"{mode}:")
+                self.run_mode(client, users, token, options)
+        finally:
+            for user in users:
+                remove_all_user_tokens(user.id)
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def run_mode(self, client, users, token, options):
+        deadline = time.perf_counter() + options["duration"]
+        results = {"login": [], "read": []}
+        lock = threading.Lock()
+
+        def loop(kind, send):
+            timings, statuses = [], Counter()
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                statuses[send()] += 1
+                timings.append(time.perf_counter() - started)
+            with lock:
+                results[kind].append((timings, statuses))
+
+        def login(user):
+            return lambda: client.post(
+                "/api/accounts/login/", json={"email": user.email, "password": PASSWORD},
+            ).status_code
+
+        def read():
+            return client.get(
+                "/api/accounts/me/", headers={"Authorization": f"Bearer {token}"},
+            ).status_code
+
+        threads = [
+            threading.Thread(target=loop, args=("login", login(user))) for user in users
+        ] + [
+            threading.Thread(target=loop, args=("read", read))
+            for _ in range(options["read_threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for kind, runs in results.items():
+            timings = sorted(t for run_timings, _ in runs for t in run_timings)
+            statuses = sum((run_statuses for _, run_statuses in runs), Counter())
+            if not timings:
+                continue
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(
+                f"  {kind:<6} {statuses[200] / options['duration']:>7.1f} ok/s  "
+                f"p50 {statistics.median(timings) * 1000:>7.1f} ms  "
+                f"p99 {p99 * 1000:>7.1f} ms  statuses {dict(statuses)}"
+            )
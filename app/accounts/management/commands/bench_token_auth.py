@@ -0,0 +1,145 @@
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from redis.exceptions import ResponseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import RedisJWTAuthentication
+from accounts.near_cache import get_near_cache
+from accounts.redis_service import (
+    ACCESS_TOKEN_PREFIX,
+    TOKEN_WHITELIST_KEY,
+    is_access_token_whitelisted,
+    redis_client,
+    whitelist_access_token,
+)
+
+EMAIL = "token-bench-{}@example.invalid"
+
+
+class LegacyRedisJWTAuthentication(JWTAuthentication):
+    """
+    RedisJWTAuthentication as it was: the whitelist check decodes the token a
+    second time and the user comes from a SELECT on every request.
+    """
+
+    def authenticate(self, request):
+        validated = super().authenticate(request)
+        if validated is None:
+            return None
+        token_str = request.headers.get("Authorization", "").split(" ")[1]
+        if not is_access_token_whitelisted(token_str):
+            raise AssertionError("Token not whitelisted")
+        return validated
+
+
+class Command(BaseCommand):
+    help = (
+        "Time RedisJWTAuthentication with the whitelist check re-decoding the "
+        "header and the user read from the database (before) against the "
+        "validated token reused and the user cached (after), and compare "
+        "Redis memory of the per-token key layout with the per-user sorted sets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--tokens-per-user", type=int, default=5,
+                            help="Tokens whitelisted per user for the memory comparison.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = [User.objects.create_user(EMAIL.format(i)) for i in range(options["users"])]
+        lifetime = int(settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds())
+        try:
+            tokens = []
+            for user in users:
+                token = str(AccessToken.for_user(user))
+                whitelist_access_token(token, lifetime)
+                tokens.append(token)
+            self.bench_auth(tokens, options["requests"])
+            self.bench_memory(users, options["tokens_per_user"], lifetime)
+        finally:
+            for user in users:
+                redis_client.unlink(TOKEN_WHITELIST_KEY.format(user_id=user.id))
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def bench_auth(self, tokens, count):
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.get("/", HTTP_AUTHORIZATION=f"Bearer {tokens[i % len(tokens)]}"))
+            for i in range(count)
+        ]
+        near_cache = get_near_cache(redis_client)
+        ttl = near_cache.ttl
+
+        self.stdout.write(f"{'':<22} {'cpu us/req':>11} {'wall us/req':>12}")
+        try:
+            # Every check goes to Redis, so only the token handling differs.
+            near_cache.ttl = 0
+            self.time_auth("before", LegacyRedisJWTAuthentication(), requests)
+            self.time_auth("after", RedisJWTAuthentication(), requests)
+            near_cache.ttl = ttl
+            # Warm the near-cache (its subscriber connects in the background).
+            time.sleep(0.5)
+            RedisJWTAuthentication().authenticate(requests[0])
+            self.time_auth("after + near-cache", RedisJWTAuthentication(), requests)
+        finally:
+            near_cache.ttl = ttl
+
+    def time_auth(self, label, authentication, requests):
+        for request in requests[:100]:
+            authentication.authenticate(request)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for request in requests:
+            authentication.authenticate(request)
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        per_request = 1e6 / len(requests)
+        self.stdout.write(f"{label:<22} {cpu * per_request:>11.1f} {wall * per_request:>12.1f}")
+
+    def bench_memory(self, users, per_user, lifetime):
+        tokens = {user.id: [str(AccessToken.for_user(user)) for _ in range(per_user)] for user in users}
+
+        legacy_keys = []
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, user_tokens in tokens.items():
+            for token in user_tokens:
+                key = ACCESS_TOKEN_PREFIX.format(user_id=user_id) + token
+                pipe.set(key, "1", ex=lifetime)
+                legacy_keys.append(key)
+        pipe.execute()
+        try:
+            legacy = self.memory(legacy_keys)
+        finally:
+            redis_client.unlink(*legacy_keys)
+
+        for user_tokens in tokens.values():
+            for token in user_tokens:
+                whitelist_access_token(token, lifetime)
+        current = self.memory([TOKEN_WHITELIST_KEY.format(user_id=user_id) for user_id in tokens])
+
+        count = sum(len(user_tokens) for user_tokens in tokens.values())
+        unit = "bytes (MEMORY USAGE)" if legacy[1] else "bytes of keys and members"
+        self.stdout.write(
+            f"\n{count} tokens, {unit}: per-token keys {legacy[0]}, "
+            f"per-user sorted sets {current[0]} ({legacy[0] / current[0]:.1f}x smaller)"
+        )
+
+    @staticmethod
+    def memory(keys):
+        """Total size of ``keys``, and whether Redis measured it."""
+        try:
+            return sum(redis_client.memory_usage(key) or 0 for key in keys), True
+        except ResponseError:
+            total = 0
+            for key in keys:
+                total += len(key)
+                if redis_client.type(key) == "zset":
+                    total += sum(len(member) + 8 for member in redis_client.zrange(key, 0, -1))
+                else:
+                    total += len(redis_client.get(key) or "")
+            return total, False
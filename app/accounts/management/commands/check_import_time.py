@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each kind of process imports before it can do any work. Beat imports
+# a subset of what the worker does.
+PROFILES = {
+    # With CELERY_SKIP_CHECKS, as docker-compose starts the worker.
+    "worker": (
+        "import os; os.environ['CELERY_SKIP_CHECKS'] = '1'; "
+        "import django; django.setup(); "
+        "from core.celery import app; app.loader.import_default_modules()"
+    ),
+    "web": "import django; django.setup(); import core.urls",
+}
+
+# SDKs that must only be imported by the code paths that use them.
+LAZY_MODULES = ("firebase_admin", "google.auth", "google.cloud", "grpc", "stripe")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh interpreters with python -X importtime the way a Celery "
+        "worker and the web app do, report the import time and the slowest "
+        "top-level imports, and fail if a lazily loaded SDK (firebase_admin, "
+        "google-auth, stripe) gets imported at startup. "
+        "--save writes a baseline; --compare diffs against one and fails on "
+        "a regression beyond --tolerance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                            help="Defaults to all profiles.")
+        parser.add_argument("--runs", type=int, default=3,
+                            help="The fastest run counts; the others are noise.")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--save", metavar="PATH")
+        parser.add_argument("--compare", metavar="PATH")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed import time growth over the baseline.")
+
+    def handle(self, *args, **options):
+        baseline = json.loads(Path(options["compare"]).read_text()) if options["compare"] else {}
+        results = {}
+        failures = []
+        for profile in options["profile"] or sorted(PROFILES):
+            runs = [self.measure(PROFILES[profile]) for _ in range(options["runs"])]
+            wall, modules = min(runs, key=lambda run: run[0])
+            total = sum(self_us for self_us, _, _ in modules.values()) / 1000
+            results[profile] = {"total_ms": round(total, 1), "modules": sorted(modules)}
+
+            self.stdout.write(
+                f"{profile}: {len(modules)} modules, imports {total:.0f} ms, "
+                f"interpreter exits after {wall * 1000:.0f} ms"
+            )
+            top_level = sorted(
+                ((cumulative, name) for name, (_, cumulative, depth) in modules.items() if depth == 0),
+                reverse=True,
+            )
+            for cumulative, name in top_level[:options["top"]]:
+                self.stdout.write(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+            eager = [name for name in LAZY_MODULES if name in modules]
+            if eager:
+                failures.append(f"{profile} imports {', '.join(eager)} at startup")
+
+            if profile in baseline:
+                failures += self.compare(profile, results[profile], baseline[profile],
+                                         options["tolerance"])
+
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Baseline written to {options['save']}")
+        if failures:
+            raise CommandError("; ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Import time check passed."))
+
+    @staticmethod
+    def measure(code):
+        """(wall seconds, {module: (self us, cumulative us, depth)}) of one interpreter."""
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - started
+        if proc.returncode:
+            raise CommandError(proc.stderr.strip().splitlines()[-1])
+        modules = {}
+        for match in _LINE.finditer(proc.stderr):
+            self_us, cumulative, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative), (len(indent) - 1) // 2)
+        return wall, modules
+
+    def compare(self, profile, current, previous, tolerance):
+        added = sorted({name.split(".")[0] for name in current["modules"]}
+                       - {name.split(".")[0] for name in previous["modules"]})
+        change = current["total_ms"] - previous["total_ms"]
+        self.stdout.write(
+            f"  vs baseline: {change:+.0f} ms ({previous['total_ms']:.0f} ms before)"
+            + (f", new packages: {', '.join(added)}" if added else "")
+        )
+        if current["total_ms"] > previous["total_ms"] * (1 + tolerance):
+            return [f"{profile} imports take {change:+.0f} ms over the baseline"]
+        return []
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.near_cache import REVOCATIONS_CHANNEL
+from accounts.redis_service import (
+    TOKEN_WHITELIST_KEY,
+    ais_access_token_whitelisted,
+    is_access_token_whitelisted,
+    redis_client,
+    remove_access_token,
+    remove_all_user_tokens,
+    whitelist_tokens,
+)
+from core.async_redis import cache_get
+from core.redis import get_redis
+from subscriptions.cache import MY_SUBSCRIPTION_KEY, invalidate_users_subscription_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Exercise every Redis access path (django_redis cache, token whitelist, "
+        "pipelines, Lua, pub/sub, redis.asyncio) against the configured Redis. "
+        "Run with REDIS_CLUSTER=1 and REDIS_DATABASE_URL pointing at a node of "
+        "a local cluster (docker compose --profile cluster up redis-cluster)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20,
+                            help="Fake user ids to spread over the cluster slots.")
+
+    def handle(self, *args, **options):
+        client = get_redis()
+        mode = "cluster" if settings.REDIS_CLUSTER else "standalone"
+        self.stdout.write(f"{mode} at {settings.CACHES['default']['LOCATION']}")
+        self.expect("ping", client.ping())
+
+        user_ids = [10_000_000 + i for i in range(options["users"])]
+        try:
+            self.check_cache(user_ids)
+            self.check_whitelist(user_ids)
+        finally:
+            for user_id in user_ids:
+                remove_all_user_tokens(user_id)
+        self.stdout.write(self.style.SUCCESS("All Redis checks passed."))
+
+    def expect(self, name, ok):
+        if not ok:
+            raise CommandError(f"{name}: failed")
+        self.stdout.write(f"  {name}: ok")
+
+    def check_cache(self, user_ids):
+        for user_id in user_ids:
+            cache.set(MY_SUBSCRIPTION_KEY.format(user_id=user_id), {"user": user_id}, 60)
+        self.expect(
+            "cache get/set",
+            all(cache.get(MY_SUBSCRIPTION_KEY.format(user_id=user_id)) == {"user": user_id}
+                for user_id in user_ids),
+        )
+        self.expect(
+            "async cache read",
+            asyncio.run(cache_get(MY_SUBSCRIPTION_KEY.format(user_id=user_ids[0])))
+            == {"user": user_ids[0]},
+        )
+        # One DEL over keys of many users, i.e. many slots.
+        invalidate_users_subscription_cache(user_ids)
+        self.expect(
+            "multi-user delete",
+            not any(cache.get(MY_SUBSCRIPTION_KEY.format(user_id=user_id)) for user_id in user_ids),
+        )
+        key = f"check_redis:{time.time_ns()}"
+        cache.set(key, 1, 60)
+        self.expect("cache incr (Lua)", cache.incr(key) == 2)
+        cache.delete(key)
+
+    def check_whitelist(self, user_ids):
+        pairs = []
+        for user_id in user_ids:
+            # Not RefreshToken.for_user: these users are not in the database.
+            refresh = RefreshToken()
+            refresh[jwt_settings.USER_ID_CLAIM] = str(user_id)
+            access = str(refresh.access_token)
+            whitelist_tokens(access, str(refresh))
+            pairs.append((user_id, access))
+        self.expect(
+            "whitelist pipeline + EVAL",
+            all(redis_client.zcard(TOKEN_WHITELIST_KEY.format(user_id=user_id)) == 2
+                for user_id, _ in pairs),
+        )
+        self.expect("whitelist check", all(is_access_token_whitelisted(token) for _, token in pairs))
+        self.expect(
+            "async whitelist check",
+            asyncio.run(ais_access_token_whitelisted(pairs[0][1])),
+        )
+
+        token = pairs[0][1]
+        remove_access_token(token)
+        self.expect("revoke token", not is_access_token_whitelisted(token))
+        remove_all_user_tokens(pairs[1][0])
+        self.expect("revoke all user tokens", not is_access_token_whitelisted(pairs[1][1]))
+
+        # The near-cache subscriber connects in the background.
+        time.sleep(1.5)
+        self.expect(
+            "revocation subscriber",
+            redis_client.pubsub_numsub(REVOCATIONS_CHANNEL)[0][1] >= 1,
+        )
@@ -0,0 +1,239 @@
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from itertools import islice
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from subscriptions.cache import invalidate_users_subscription_cache
+from subscriptions.locks import lock_users
+from subscriptions.models import SubscriptionType, UserSubscription
+from subscriptions.timers import register_subscription_timers
+
+TRUE = {"1", "true", "t", "yes", "y"}
+FALSE = {"0", "false", "f", "no", "n", ""}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import accounts and their subscriptions from a CSV or NDJSON file "
+        "(one object per line), streamed in chunks, one transaction and a "
+        "progress line per chunk. Columns: email (required), password (an "
+        "existing Django hash, kept as is; empty for an unusable password), "
+        "first_name, last_name, phone_number, age, is_active, date_joined, and "
+        "optionally subscription_type (plan id or name), start_date, "
+        "end_date, subscription_active, stripe_session_id. A row per "
+        "subscription; account columns are taken from the first row of an "
+        "email. Accounts that already exist (by email) and subscriptions "
+        "that already exist (by stripe_session_id, or user, plan and "
+        "start_date) are skipped, so the import can be re-run after a failure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="Defaults to the file extension (.csv, else NDJSON).")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options["format"] or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+
+        self.plans = {}
+        for plan_id, name in SubscriptionType.objects.values_list("id", "name"):
+            self.plans[str(plan_id)] = plan_id
+            self.plans[name] = plan_id
+
+        totals = Counter()
+        started = time.monotonic()
+        rows = self.read(path, fmt)
+        while chunk := list(islice(rows, options["chunk_size"])):
+            self.import_chunk(chunk, totals)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{totals['rows']} rows ({totals['rows'] / elapsed:.0f}/s): "
+                f"{totals['accounts']} accounts created ({totals['existing_accounts']} already present), "
+                f"{totals['subscriptions']} subscriptions created "
+                f"({totals['existing_subscriptions']} already present), {totals['invalid']} invalid"
+            )
+        self.stdout.write(self.style.SUCCESS("Import finished."))
+
+    @staticmethod
+    def read(path, fmt):
+        """
+        Yield ``(line number, row)`` without loading the file: a dict for
+        CSV, the line itself for NDJSON (decoded with the row's other checks).
+        """
+        with path.open(newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                reader = csv.DictReader(f)
+                for row in reader:
+                    yield reader.line_num, row
+            else:
+                for line_num, line in enumerate(f, 1):
+                    if line.strip():
+                        yield line_num, line
+
+    def import_chunk(self, chunk, totals):
+        User = get_user_model()
+        accounts = {}
+        subscriptions = []
+        for line_num, row in chunk:
+            totals["rows"] += 1
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                account = self.parse_account(row)
+                subscription = self.parse_subscription(row)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                # Includes malformed JSON and values of the wrong type.
+                totals["invalid"] += 1
+                self.stderr.write(f"line {line_num}: {e!r}")
+                continue
+            accounts.setdefault(account.email, account)
+            if subscription is not None:
+                subscriptions.append((account.email, subscription))
+
+        with transaction.atomic():
+            existing = set(User.objects.filter(email__in=accounts).values_list("email", flat=True))
+            new_accounts = [a for email, a in accounts.items() if email not in existing]
+            # ignore_conflicts: an account created since the lookup above is
+            # simply left alone.
+            User.objects.bulk_create(new_accounts, ignore_conflicts=True)
+            user_ids = dict(User.objects.filter(email__in=accounts).values_list("email", "id"))
+            created = len(user_ids) - len(existing)
+            totals["accounts"] += created
+            totals["existing_accounts"] += len(accounts) - created
+
+            # Same per-user locks as purchases, webhooks and the scheduler;
+            # the duplicate check below runs under them.
+            lock_users(user_ids[email] for email, _ in subscriptions)
+            new_subscriptions = self.new_subscriptions(subscriptions, user_ids, totals)
+            UserSubscription.objects.bulk_create(new_subscriptions)
+            totals["subscriptions"] += len(new_subscriptions)
+
+            # bulk_create sends no post_save: do what the subscription
+            # signals would have done once the rows are visible.
+            changed_users = {sub.user_id for sub in new_subscriptions}
+            # Subscriptions that already ended have no transition left.
+            now = timezone.now()
+            pending = [sub for sub in new_subscriptions if sub.end_date > now]
+            transaction.on_commit(lambda: register_subscription_timers(pending), robust=True)
+            transaction.on_commit(lambda: invalidate_users_subscription_cache(changed_users), robust=True)
+
+    @staticmethod
+    def new_subscriptions(subscriptions, user_ids, totals):
+        seen = set(
+            UserSubscription.objects.filter(user_id__in=user_ids.values())
+            .values_list("user_id", "subscription_type_id", "start_date")
+        )
+        sessions = {sub.stripe_session_id for _, sub in subscriptions if sub.stripe_session_id}
+        seen_sessions = set(
+            UserSubscription.objects.filter(stripe_session_id__in=sessions)
+            .values_list("stripe_session_id", flat=True)
+        )
+
+        new = []
+        for email, sub in subscriptions:
+            sub.user_id = user_ids[email]
+            key = (sub.user_id, sub.subscription_type_id, sub.start_date)
+            if key in seen or sub.stripe_session_id in seen_sessions:
+                totals["existing_subscriptions"] += 1
+                continue
+            seen.add(key)
+            if sub.stripe_session_id:
+                seen_sessions.add(sub.stripe_session_id)
+            new.append(sub)
+        return new
+
+    def parse_account(self, row):
+        User = get_user_model()
+        email = User.objects.normalize_email(_text(row.get("email")).strip())
+        if not email:
+            raise ValueError("email is required")
+        password = _text(row.get("password"))
+        if password:
+            # Raises ValueError for anything that is not a known hash.
+            identify_hasher(password)
+        else:
+            password = make_password(None)
+        age = row.get("age")
+        return User(
+            email=email,
+            password=password,
+            first_name=_text(row.get("first_name")),
+            last_name=_text(row.get("last_name")),
+            phone_number=_text(row.get("phone_number")) or None,
+            age=int(age) if age not in (None, "") else None,
+            is_active=_bool(row.get("is_active", True)),
+            date_joined=_datetime(row.get("date_joined")) or timezone.now(),
+        )
+
+    def parse_subscription(self, row):
+        plan = row.get("subscription_type")
+        if plan in (None, ""):
+            return None
+        if str(plan) not in self.plans:
+            raise ValueError(f"unknown subscription_type {plan!r}")
+        start_date = _datetime(row["start_date"])
+        end_date = _datetime(row["end_date"])
+        if start_date is None or end_date is None or end_date <= start_date:
+            raise ValueError("start_date and end_date are required, start before end")
+        active = row.get("subscription_active")
+        if active in (None, ""):
+            now = timezone.now()
+            is_active = start_date <= now < end_date
+        else:
+            is_active = _bool(active)
+        return UserSubscription(
+            subscription_type_id=self.plans[str(plan)],
+            start_date=start_date,
+            end_date=end_date,
+            is_active=is_active,
+            stripe_session_id=_text(row.get("stripe_session_id")) or None,
+        )
+
+
+def _text(value):
+    # NDJSON values of another type would only fail in the INSERT, taking
+    # the whole chunk with them.
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise TypeError(f"expected a string, not {value!r}")
+    return value
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _datetime(value):
+    """ISO 8601 datetime or date (midnight); naive values are UTC."""
+    if value in (None, ""):
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"not a date: {value!r}")
+        parsed = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
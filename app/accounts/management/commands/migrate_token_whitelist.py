@@ -0,0 +1,78 @@
+import time
+from django.core.management.base import BaseCommand
+
+from accounts.redis_service import (
+    ACCESS,
+    ACCESS_TOKEN_PREFIX,
+    LEGACY_REVOKED_KEY,
+    REFRESH,
+    REFRESH_TOKEN_PREFIX,
+    WHITELIST_MIGRATED_KEY,
+    add_token_entries,
+    redis_client,
+    revoked_by_logout,
+    token_entry,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move whitelisted JWTs from the previous layout (one key per token) "
+        "into the hash-tagged per-user sorted sets. Safe to re-run and to run while serving "
+        "traffic: tokens stay valid throughout. A complete run turns "
+        "TOKEN_WHITELIST_LEGACY_FALLBACK off for every process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        totals = {"migrated": 0, "expired": 0}
+        for token_type, prefix in ((ACCESS, ACCESS_TOKEN_PREFIX), (REFRESH, REFRESH_TOKEN_PREFIX)):
+            pattern = prefix.format(user_id="*") + "*"
+            for batch in self.scan(pattern, options["batch_size"]):
+                self.migrate(token_type, batch, totals, options["dry_run"])
+
+        if not options["dry_run"]:
+            # Nothing writes to the old layout any more, so none are left.
+            redis_client.set(WHITELIST_MIGRATED_KEY, int(time.time()))
+
+        verb = "Would migrate" if options["dry_run"] else "Migrated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['migrated']} tokens; {totals['expired']} invalid, expired or revoked entries dropped."
+        ))
+
+    @staticmethod
+    def scan(pattern, batch_size):
+        batch = []
+        for key in redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def migrate(self, token_type, keys, totals, dry_run):
+        # "<type>_whitelist:user:<id>:<jwt>"; JWTs never contain ":".
+        tokens = [key.rsplit(":", 1)[1] for key in keys]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(LEGACY_REVOKED_KEY.format(user_id=key.split(":")[2]))
+        entries = []
+        for token, revoked_at in zip(tokens, pipe.execute()):
+            entry = token_entry(token_type, token)
+            if entry is None or revoked_by_logout(token, revoked_at):
+                totals["expired"] += 1
+            else:
+                entries.append(entry)
+                totals["migrated"] += 1
+
+        if dry_run:
+            return
+        # Write the new entries before dropping the old keys, so every token
+        # is whitelisted somewhere at all times.
+        if entries:
+            add_token_entries(entries)
+        redis_client.unlink(*keys)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashers import PasswordHashingBusy
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """
+    503 with Retry-After when the password hashing pool is saturated. Done
+    here rather than in DRF so the admin login and allauth views get it too;
+    DRF re-raises exceptions that are not APIExceptions.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        return JsonResponse(
+            {"detail": "Too many password checks in progress, please retry shortly."},
+            status=503,
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)},
+        )
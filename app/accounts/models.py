@@ -1,8 +1,32 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 
-class AccountManager(BaseUserManager):
+# Cached accounts dropped per round trip by AccountQuerySet.update().
+INVALIDATE_CHUNK_SIZE = 2000
+
+
+class AccountQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() (and bulk_update(), which goes through it) sends no
+        # post_save; drop the cached accounts it touches. The pks are read
+        # first, since the UPDATE may change what the filter matches, and
+        # streamed so a bulk update never holds the whole table; the
+        # transaction makes the second delete of each chunk follow the UPDATE.
+        from .cache import invalidate_users
+
+        with transaction.atomic(using=self.db):
+            chunk = []
+            for pk in self.values_list("pk", flat=True).iterator(chunk_size=INVALIDATE_CHUNK_SIZE):
+                chunk.append(pk)
+                if len(chunk) >= INVALIDATE_CHUNK_SIZE:
+                    invalidate_users(chunk)
+                    chunk = []
+            invalidate_users(chunk)
+            return super().update(**kwargs)
+
+
+class AccountManager(BaseUserManager.from_queryset(AccountQuerySet)):
     use_in_migrations = True
 
     def create_user(self, email, password=None, **extra_fields):
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REVOCATIONS_CHANNEL = "token_whitelist:revocations"
+
+
+class WhitelistNearCache:
+    """
+    Bounded in-process LRU of access tokens Redis recently confirmed as
+    whitelisted, keyed by ``(str(user_id), member)``.
+
+    Entries live for at most ``ttl`` seconds and never past the token's own
+    expiry. Revocations published on REVOCATIONS_CHANNEL evict them at once
+    in every process; while this process is not subscribed (startup, lost
+    connection) the cache is empty and every check goes to Redis.
+    """
+
+    def __init__(self, redis_client, max_size, ttl):
+        self.redis_client = redis_client
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._listening = False
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.revocations = 0
+
+    def contains(self, user_id, member) -> bool:
+        self._ensure_listener()
+        key = (str(user_id), member)
+        with self._lock:
+            deadline = self._entries.get(key)
+            if deadline is not None and deadline > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            if deadline is not None:
+                self._discard(key)
+            self.misses += 1
+            return False
+
+    def add(self, user_id, member, expires_at):
+        with self._lock:
+            if not self._listening:
+                return
+            key = (str(user_id), member)
+            self._entries[key] = min(expires_at, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(member)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def revoke(self, user_id, member=None):
+        """Evict locally and tell every other process to do the same."""
+        self.evict(user_id, member)
+        self.redis_client.publish(
+            REVOCATIONS_CHANNEL, json.dumps({"user_id": str(user_id), "member": member})
+        )
+
+    def evict(self, user_id, member=None):
+        # The user id claim may be a str or an int depending on who asks.
+        user_id = str(user_id)
+        with self._lock:
+            members = [member] if member else list(self._by_user.get(user_id, ()))
+            for name in members:
+                self._discard((user_id, name))
+            self.revocations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "listening": self._listening,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                # Every hit is a whitelist lookup that never reached Redis.
+                "redis_calls_saved": self.hits,
+                "revocations": self.revocations,
+            }
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            members = self._by_user.get(key[0])
+            if members is not None:
+                members.discard(key[1])
+                if not members:
+                    del self._by_user[key[0]]
+
+    def _set_listening(self, listening):
+        with self._lock:
+            self._listening = listening
+            if not listening:
+                # Revocations may have been missed; forget everything.
+                self._entries.clear()
+                self._by_user.clear()
+
+    def _ensure_listener(self):
+        # One subscriber thread per process, also after a fork.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listening = False
+            self._entries.clear()
+            self._by_user.clear()
+        threading.Thread(target=self._listen, name="whitelist-revocations", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                pubsub.subscribe(REVOCATIONS_CHANNEL)
+                while True:
+                    # Polling (rather than listen()) stays within the client's
+                    # socket timeout and lets it send health-check PINGs.
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["type"] == "subscribe":
+                        self._set_listening(True)
+                    elif message["type"] == "message":
+                        data = json.loads(message["data"])
+                        self.evict(data["user_id"], data.get("member"))
+            except Exception:
+                logger.warning("Token revocation subscriber disconnected", exc_info=True)
+            finally:
+                self._set_listening(False)
+                pubsub.close()
+            time.sleep(1)
+
+
+_near_cache = None
+_near_cache_lock = threading.Lock()
+
+
+def get_near_cache(redis_client):
+    global _near_cache
+    if _near_cache is None:
+        with _near_cache_lock:
+            if _near_cache is None:
+                _near_cache = WhitelistNearCache(
+                    redis_client,
+                    max_size=settings.TOKEN_WHITELIST_NEAR_CACHE_SIZE,
+                    ttl=settings.TOKEN_WHITELIST_NEAR_CACHE_TTL,
+                )
+    return _near_cache
@@ -1,88 +1,261 @@
-import redis
+import time
 from django.conf import settings
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import Token, UntypedToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
-redis_client = redis.StrictRedis.from_url(
-    settings.CACHES["default"]["LOCATION"], decode_responses=True
-)
+from core.async_redis import get_async_redis
+from core.redis import get_redis
+from .near_cache import get_near_cache
 
+redis_client = get_redis(decode_responses=True)
+
+# One sorted set per user: member "<access|refresh>:<jti>", score = token exp.
+# The {user_id} hash tag keeps all of a user's keys on one Redis Cluster slot.
+TOKEN_WHITELIST_KEY = "token_whitelist:user:{{{user_id}}}"
+
+# Previous layout, one key per token: read while TOKEN_WHITELIST_LEGACY_FALLBACK
+# is on and moved by manage.py migrate_token_whitelist.
 ACCESS_TOKEN_PREFIX = "access_whitelist:user:{user_id}:"
 REFRESH_TOKEN_PREFIX = "refresh_whitelist:user:{user_id}:"
+# Set by migrate_token_whitelist once nothing is left in that layout; the
+# fallback is off from then on.
+WHITELIST_MIGRATED_KEY = "token_whitelist:migrated"
+# When the user was last logged out everywhere. Per-token keys of tokens
+# issued before that are refused rather than looked up with SCAN and deleted.
+LEGACY_REVOKED_KEY = "token_whitelist:legacy-revoked:{{{user_id}}}"
+
+ACCESS = "access"
+REFRESH = "refresh"
+_LEGACY_PREFIXES = {ACCESS: ACCESS_TOKEN_PREFIX, REFRESH: REFRESH_TOKEN_PREFIX}
+
+# Add ARGV[2..] (member, score pairs) to KEYS[1], drop entries that expired
+# before ARGV[1] and keep the key alive until its last entry expires.
+_ADD_TOKENS = """
+for i = 2, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if last[2] then
+    redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(last[2])))
+end
+return #last
+"""
+
+
+_migrated = False
+
+
+def _legacy_fallback() -> bool:
+    global _migrated
+    if not settings.TOKEN_WHITELIST_LEGACY_FALLBACK or _migrated:
+        return False
+    _migrated = bool(redis_client.exists(WHITELIST_MIGRATED_KEY))
+    return not _migrated
+
+
+async def _alegacy_fallback(client) -> bool:
+    global _migrated
+    if not settings.TOKEN_WHITELIST_LEGACY_FALLBACK or _migrated:
+        return False
+    _migrated = bool(await client.exists(WHITELIST_MIGRATED_KEY))
+    return not _migrated
+
 
-def get_user_id_from_token(token: str):
+def revoked_by_logout(token, revoked_at) -> bool:
+    """
+    Whether a token of the per-token layout predates the user's last
+    logout everywhere (``revoked_at``, the value of LEGACY_REVOKED_KEY).
+    """
+    # Tokens are only written to the per-token layout by older releases, so
+    # everything issued in the second of the logout predates it.
+    return revoked_at is not None and _decode(token).get("iat", 0) <= int(revoked_at)
+
+
+def _decode(token):
+    # Tokens that were already validated (request.auth) are used as they are,
+    # so the signature is checked once per request.
+    if isinstance(token, Token):
+        return token
     try:
-        payload = UntypedToken(token)
-        return payload.get("user_id")
-    except InvalidToken:
+        return UntypedToken(token)
+    except (InvalidToken, TokenError):
         return None
 
 
-def whitelist_access_token(token: str, lifetime_seconds: int):
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
-        return
+def _raw(token) -> str:
+    if not isinstance(token, Token):
+        return token
+    raw = token.token if token.token is not None else str(token)
+    return raw.decode() if isinstance(raw, bytes) else raw
 
-    key = ACCESS_TOKEN_PREFIX.format(user_id=user_id) + token
-    redis_client.setex(key, lifetime_seconds, "1")
 
+def get_user_id_from_token(token):
+    payload = _decode(token)
+    if payload is None:
+        return None
+    return payload.get(jwt_settings.USER_ID_CLAIM)
 
-def is_access_token_whitelisted(token: str) -> bool:
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
-        return False
 
-    key = ACCESS_TOKEN_PREFIX.format(user_id=user_id) + token
-    return redis_client.exists(key) == 1
+def token_entry(token_type, token, lifetime_seconds=None):
+    """
+    ``(user_id, member, expires_at)`` of a token string or validated Token,
+    or None if it is invalid.
+    """
+    payload = _decode(token)
+    if payload is None:
+        return None
+    expires_at = payload["exp"]
+    if lifetime_seconds is not None:
+        expires_at = min(expires_at, int(time.time()) + lifetime_seconds)
+    member = f"{token_type}:{payload[jwt_settings.JTI_CLAIM]}"
+    return payload.get(jwt_settings.USER_ID_CLAIM), member, expires_at
 
 
-def remove_access_token(token: str):
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
-        return
+def add_token_entries(entries):
+    """Write ``(user_id, member, expires_at)`` entries, one script call per user."""
+    by_user = {}
+    for user_id, member, expires_at in entries:
+        by_user.setdefault(user_id, []).extend([member, expires_at])
 
-    key = ACCESS_TOKEN_PREFIX.format(user_id=user_id) + token
-    redis_client.delete(key)
+    now = int(time.time())
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id, args in by_user.items():
+        # EVAL rather than EVALSHA: cluster pipelines cannot recover from NOSCRIPT.
+        pipe.eval(_ADD_TOKENS, 1, TOKEN_WHITELIST_KEY.format(user_id=user_id), now, *args)
+    pipe.execute()
 
 
-def whitelist_refresh_token(token: str, lifetime_seconds: int):
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
-        return
+def whitelist_tokens(access, refresh):
+    """Whitelist a freshly issued pair in one round trip."""
+    entries = [
+        entry for entry in (token_entry(ACCESS, access), token_entry(REFRESH, refresh)) if entry
+    ]
+    if entries:
+        add_token_entries(entries)
+
 
-    key = REFRESH_TOKEN_PREFIX.format(user_id=user_id) + token
-    redis_client.setex(key, lifetime_seconds, "1")
+def whitelist_access_token(token, lifetime_seconds: int):
+    entry = token_entry(ACCESS, token, lifetime_seconds)
+    if entry is not None:
+        add_token_entries([entry])
 
 
-def is_refresh_token_whitelisted(token: str) -> bool:
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
+def whitelist_refresh_token(token, lifetime_seconds: int):
+    entry = token_entry(REFRESH, token, lifetime_seconds)
+    if entry is not None:
+        add_token_entries([entry])
+
+
+def _is_whitelisted(token_type, token, entry) -> bool:
+    if entry is None:
         return False
+    user_id, member, _ = entry
 
-    key = REFRESH_TOKEN_PREFIX.format(user_id=user_id) + token
-    return redis_client.exists(key) == 1
+    score = redis_client.zscore(TOKEN_WHITELIST_KEY.format(user_id=user_id), member)
+    if score is not None:
+        return score > time.time()
+
+    if not _legacy_fallback():
+        return False
+    # Token whitelisted under the per-token layout: move it over on first use.
+    legacy_key = _LEGACY_PREFIXES[token_type].format(user_id=user_id) + _raw(token)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.exists(legacy_key)
+    pipe.get(LEGACY_REVOKED_KEY.format(user_id=user_id))
+    legacy, revoked_at = pipe.execute()
+    if not legacy or revoked_by_logout(token, revoked_at):
+        return False
+    add_token_entries([entry])
+    redis_client.unlink(legacy_key)
+    return True
+
+
+def is_access_token_whitelisted(token) -> bool:
+    entry = token_entry(ACCESS, token)
+    if entry is None:
+        return False
+    user_id, member, expires_at = entry
+
+    near_cache = get_near_cache(redis_client)
+    if near_cache.contains(user_id, member):
+        return True
+    if not _is_whitelisted(ACCESS, token, entry):
+        return False
+    near_cache.add(user_id, member, expires_at)
+    return True
+
+
+async def ais_access_token_whitelisted(token) -> bool:
+    entry = token_entry(ACCESS, token)
+    if entry is None:
+        return False
+    user_id, member, expires_at = entry
+
+    near_cache = get_near_cache(redis_client)
+    if near_cache.contains(user_id, member):
+        return True
+
+    client = get_async_redis()
+    score = await client.zscore(TOKEN_WHITELIST_KEY.format(user_id=user_id), member)
+    if score is not None:
+        whitelisted = score > time.time()
+    elif await _alegacy_fallback(client):
+        legacy_key = ACCESS_TOKEN_PREFIX.format(user_id=user_id) + _raw(token)
+        whitelisted = (
+            await client.exists(legacy_key) == 1
+            and not revoked_by_logout(token, await client.get(LEGACY_REVOKED_KEY.format(user_id=user_id)))
+        )
+    else:
+        whitelisted = False
+
+    if whitelisted:
+        near_cache.add(user_id, member, expires_at)
+    return whitelisted
 
 
-def remove_refresh_token(token: str):
-    user_id = get_user_id_from_token(token)
-    if user_id is None:
+def token_cache_stats():
+    """Near-cache counters of this process."""
+    return get_near_cache(redis_client).stats()
+
+
+def is_refresh_token_whitelisted(token) -> bool:
+    return _is_whitelisted(REFRESH, token, token_entry(REFRESH, token))
+
+
+def _remove(token_type, token):
+    entry = token_entry(token_type, token)
+    if entry is None:
         return
+    user_id, member, _ = entry
 
-    key = REFRESH_TOKEN_PREFIX.format(user_id=user_id) + token
-    redis_client.delete(key)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrem(TOKEN_WHITELIST_KEY.format(user_id=user_id), member)
+    if _legacy_fallback():
+        pipe.unlink(_LEGACY_PREFIXES[token_type].format(user_id=user_id) + _raw(token))
+    pipe.execute()
+    if token_type == ACCESS:
+        get_near_cache(redis_client).revoke(user_id, member)
 
-def remove_all_user_tokens(user_id: int):
-    patterns = [
-        ACCESS_TOKEN_PREFIX.format(user_id=user_id) + "*",
-        REFRESH_TOKEN_PREFIX.format(user_id=user_id) + "*",
-    ]
 
-    for pattern in patterns:
-        cursor = 0
-        while True:
-            cursor, keys = redis_client.scan(cursor=cursor, match=pattern, count=100)
-            if keys:
-                redis_client.delete(*keys)
-            if cursor == 0:
-                break
+def remove_access_token(token):
+    _remove(ACCESS, token)
 
+
+def remove_refresh_token(token):
+    _remove(REFRESH, token)
+
+
+def remove_all_user_tokens(user_id: int):
+    redis_client.unlink(TOKEN_WHITELIST_KEY.format(user_id=user_id))
+    get_near_cache(redis_client).revoke(user_id)
+
+    if not _legacy_fallback():
+        return
+    # Until migrate_token_whitelist has run, this user may still have
+    # per-token keys.
+    redis_client.set(
+        LEGACY_REVOKED_KEY.format(user_id=user_id), int(time.time()),
+        ex=int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
@@ -3,10 +3,10 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.conf import settings
-from django.core.mail import send_mail
 
+from .mail import enqueue_mail
 from .utils import generate_reset_token
-from .redis_service import whitelist_access_token, whitelist_refresh_token
+from .redis_service import whitelist_access_token, whitelist_tokens
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import AccessToken
 
@@ -36,21 +36,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super().validate(attrs)
 
-        access = data["access"]
-        refresh = data["refresh"]
-
-        access_lifetime = settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"]
-        refresh_lifetime = settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"]
-
-        whitelist_access_token(
-            token=str(access),
-            lifetime_seconds=int(access_lifetime.total_seconds())
-        )
-
-        whitelist_refresh_token(
-            token=str(refresh),
-            lifetime_seconds=int(refresh_lifetime.total_seconds())
-        )
+        whitelist_tokens(access=str(data["access"]), refresh=str(data["refresh"]))
 
         return data
     
@@ -84,7 +70,7 @@ class ForgotPasswordSerializer(serializers.Serializer):
 
         reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
 
-        send_mail(
+        enqueue_mail(
             subject="Password Reset",
             message=f"Click the link to reset your password:\n\n{reset_url}",
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -0,0 +1,13 @@
+import smtplib
+from celery import shared_task
+
+from .mail import drain_outbox
+
+
+@shared_task(bind=True)
+def send_queued_mail(self):
+    """Deliver the account mail outbox over one SMTP connection."""
+    try:
+        return drain_outbox()
+    except (smtplib.SMTPException, OSError) as exc:
+        raise self.retry(exc=exc, countdown=30)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ForgotPasswordView, RegisterView, LoginView, MyTokenRefreshView, MeView, LogoutView, ResetPasswordView, UpdateAccountView
+from .views import ForgotPasswordView, RegisterView, LoginView, MyTokenRefreshView, MeView, LogoutView, ResetPasswordView, TokenCacheStatsView, UpdateAccountView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -10,4 +10,5 @@ urlpatterns = [
     path('update/', UpdateAccountView.as_view(), name='update_account'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot_password'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
+    path('token-cache-stats/', TokenCacheStatsView.as_view(), name='token_cache_stats'),
 ]
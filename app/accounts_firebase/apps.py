@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AccountsFirebaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts_firebase'
+
+    def ready(self):
+        from . import checks  # noqa: F401
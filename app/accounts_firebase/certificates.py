@@ -0,0 +1,71 @@
+import logging
+import os
+import re
+import threading
+import time
+import requests
+from django.conf import settings
+from google.auth import exceptions as google_exceptions
+from google.auth import transport
+from google.auth.transport import requests as google_requests
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class CertificateCache(transport.Request):
+    """
+    google-auth transport that serves Google's public certificates from
+    memory. A daemon thread fetches them again FIREBASE_CERTS_REFRESH_AHEAD
+    seconds before their Cache-Control max-age runs out (and keeps serving
+    the old ones if that fails), so only the very first verification of a
+    process waits on Google.
+    """
+
+    def __init__(self, timeout=None):
+        self._delegate = google_requests.Request(requests.Session())
+        self._timeout = timeout
+        # url -> (response, time it goes stale)
+        self._responses = {}
+        # url -> pid of the process whose thread refreshes it
+        self._refreshers = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        if method != "GET":
+            return self._delegate(url, method=method, body=body, headers=headers,
+                                  timeout=timeout or self._timeout, **kwargs)
+        if self._refreshers.get(url) != os.getpid():
+            with self._lock:
+                if url not in self._responses:
+                    # Cold start: nothing to serve yet.
+                    self._fetch(url)
+                if self._refreshers.get(url) != os.getpid():
+                    # Also after a fork, which keeps the responses but not the thread.
+                    self._refreshers[url] = os.getpid()
+                    threading.Thread(
+                        target=self._refresh, args=(url,),
+                        name="firebase-certificates", daemon=True,
+                    ).start()
+        return self._responses[url][0]
+
+    def _fetch(self, url):
+        response = self._delegate(url, method="GET", timeout=self._timeout)
+        if response.status != 200:
+            raise google_exceptions.TransportError(
+                f"Could not fetch certificates at {url}: HTTP {response.status}"
+            )
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else 3600
+        self._responses[url] = (response, time.time() + max_age)
+
+    def _refresh(self, url):
+        while True:
+            stale_at = self._responses[url][1]
+            time.sleep(max(stale_at - settings.FIREBASE_CERTS_REFRESH_AHEAD - time.time(), 60))
+            try:
+                self._fetch(url)
+            except Exception:
+                # Keep serving the certificates we have; retry in a minute.
+                logger.warning("Could not refresh Firebase certificates", exc_info=True)
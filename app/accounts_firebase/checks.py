@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register()
+def check_firebase_key(app_configs, **kwargs):
+    # firebase_admin is only set up on the first Firebase login; catch a
+    # missing key at startup without importing it.
+    if settings.FIREBASE_CERT_PATH.is_file():
+        return []
+    return [checks.Error(
+        f"FIREBASE_CERT_PATH ({settings.FIREBASE_CERT_PATH}) is not a file.",
+        hint="Firebase logins need the service account key of the project.",
+        id="accounts_firebase.E001",
+    )]
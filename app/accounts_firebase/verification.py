@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+
+VERIFIED_TOKEN_KEY = "firebase:id_token:{digest}"
+
+_auth = None
+_auth_error = None
+_auth_lock = threading.Lock()
+
+
+def _firebase_auth():
+    """
+    ``firebase_admin.auth``, imported and set up on first use: firebase_admin
+    and google-auth are slow to import, and only Firebase logins need them.
+    Raises ImproperlyConfigured, every time and without retrying, if the
+    key at FIREBASE_CERT_PATH cannot be loaded.
+    """
+    global _auth, _auth_error
+    if _auth is not None:
+        return _auth
+    with _auth_lock:
+        if _auth_error is not None:
+            raise ImproperlyConfigured(_auth_error)
+        if _auth is not None:
+            return _auth
+        import firebase_admin
+        from firebase_admin import auth, credentials
+
+        from .certificates import CertificateCache
+
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            try:
+                cred = credentials.Certificate(settings.FIREBASE_CERT_PATH)
+            except (OSError, ValueError) as e:
+                _auth_error = f"Invalid FIREBASE_CERT_PATH: {e}"
+                raise ImproperlyConfigured(_auth_error) from e
+            firebase_admin.initialize_app(cred)
+        # firebase_admin has no public hook for its certificate transport;
+        # swap the one its token verifier was built with.
+        verifier = auth._get_client(None)._token_verifier
+        verifier.request = CertificateCache(verifier.request.timeout_seconds)
+        _auth = auth
+    return _auth
+
+
+def verify_id_token(id_token: str):
+    """
+    ``firebase_auth.verify_id_token`` whose successful results are cached
+    in Redis until the token's ``exp``, so repeat logins with the same ID
+    token skip the RSA signature check.
+    """
+    key = VERIFIED_TOKEN_KEY.format(digest=hashlib.sha256(id_token.encode()).hexdigest())
+    claims = cache.get(key)
+    if claims is not None:
+        return claims
+
+    claims = _firebase_auth().verify_id_token(id_token, clock_skew_seconds=60)
+    timeout = int(claims["exp"] - time.time())
+    if timeout > 0:
+        cache.set(key, claims, timeout)
+    return claims
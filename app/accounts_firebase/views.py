@@ -1,9 +1,9 @@
 from rest_framework.views import APIView
-from accounts.redis_service import whitelist_access_token, whitelist_refresh_token
-from django.conf import settings
+from accounts.redis_service import whitelist_tokens
 from rest_framework.response import Response
-from firebase_admin import auth as firebase_auth
+from .verification import verify_id_token
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 
@@ -16,7 +16,10 @@ class FirebaseLoginView(APIView):
             return Response({"error": "Missing Firebase ID token"}, status=400)
 
         try:
-            decoded = firebase_auth.verify_id_token(id_token, clock_skew_seconds=60)
+            decoded = verify_id_token(id_token)
+        except ImproperlyConfigured:
+            # Our setup, not the client's token: a 500, not a 401.
+            raise
         except Exception as e:
             print(e)
             return Response({"error": "Invalid Firebase token"}, status=401)
@@ -38,11 +41,7 @@ class FirebaseLoginView(APIView):
         refresh = RefreshToken.for_user(user)
         access = refresh.access_token
 
-        access_lifetime = settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"]
-        refresh_lifetime = settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"]
-
-        whitelist_access_token(str(access), int(access_lifetime.total_seconds()))
-        whitelist_refresh_token(str(refresh), int(refresh_lifetime.total_seconds()))
+        whitelist_tokens(access=str(access), refresh=str(refresh))
 
         return Response({
             "created": created,
@@ -0,0 +1,111 @@
+"""
+Async implementation of checkout creation, enabled with ASYNC_VIEWS.
+Behaviour matches CreateStripeCheckoutView in views.py.
+"""
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+
+from core.async_views import AsyncAPIView, json_response
+from .cache import (
+    acheckout_expires_at,
+    aforget_open_session,
+    aget_checkout_response,
+    aget_open_session,
+    aset_checkout_response,
+    aset_open_session,
+)
+from .serializers import CreateCheckoutSerializer
+from .stripe_client import acreate_checkout_session, aretrieve_checkout_session
+from .views import (
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    STRIPE_ERRORS,
+    can_reuse_session,
+    checkout_fingerprint,
+    checkout_request_options,
+    checkout_session_params,
+    replay_checkout,
+    stripe_error,
+)
+from subscriptions.catalog import aget_catalog, attach_plans
+from subscriptions.models import UserSubscription
+from subscriptions.pricing import acurrent_subscription, quote_plans
+
+
+class CreateStripeCheckoutView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        catalog = await aget_catalog()
+        serializer = CreateCheckoutSerializer(data=request.data, context={"catalog": catalog})
+        serializer.is_valid(raise_exception=True)
+
+        new_type = serializer.validated_data["subscription_type"]
+        user = request.user
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key is not None:
+            if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+                return json_response(
+                    {"error": f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters."},
+                    status=400,
+                )
+            cached = await aget_checkout_response(user.id, idempotency_key)
+            if cached is not None:
+                data, status_code = replay_checkout(cached, new_type.id)
+                return json_response(data, status=status_code)
+
+        now = timezone.now()
+
+        future_sub_exists = await UserSubscription.objects.filter(
+            user=user,
+            is_active=False,
+            start_date__gt=now,
+        ).aexists()
+
+        if future_sub_exists:
+            return json_response(
+                {"error": "You already have a scheduled subscription change. Wait until it activates before making another purchase."},
+                status=400,
+            )
+
+        current = await acurrent_subscription(user.id)
+        if current:
+            attach_plans([current], catalog)
+
+        # A queued change was rejected above, so only the current plan counts.
+        quote = quote_plans(current, None, [new_type], now).plans[new_type.id]
+        amount_cents = quote.amount_cents
+
+        payload = await aget_open_session(user.id, new_type.id, amount_cents)
+        if payload is not None:
+            try:
+                session = await aretrieve_checkout_session(payload["session_id"])
+            except STRIPE_ERRORS as e:
+                data, status_code, headers = stripe_error(e)
+                return json_response(data, status=status_code, headers=headers)
+            if not can_reuse_session(session):
+                await aforget_open_session(user.id, new_type.id, amount_cents)
+                payload = None
+
+        if payload is None:
+            try:
+                session = await acreate_checkout_session(
+                    checkout_session_params(
+                        user, new_type, amount_cents,
+                        await acheckout_expires_at(user.id, idempotency_key),
+                    ),
+                    checkout_request_options(user.id, idempotency_key),
+                )
+            except STRIPE_ERRORS as e:
+                data, status_code, headers = stripe_error(e)
+                return json_response(data, status=status_code, headers=headers)
+
+            payload = {"checkout_url": session.url, "session_id": session.id}
+            await aset_open_session(user.id, new_type.id, amount_cents, payload)
+
+        if idempotency_key is not None:
+            await aset_checkout_response(
+                user.id, idempotency_key, checkout_fingerprint(new_type.id, amount_cents), payload,
+            )
+
+        return json_response(payload)
@@ -0,0 +1,115 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+from core.async_redis import cache_add, cache_delete, cache_get, cache_set
+
+# {"request": checkout_fingerprint(...), "response": payload}
+CHECKOUT_RESPONSE_KEY = "billing:checkout:replay:{{{user_id}}}:{digest}"
+CHECKOUT_EXPIRES_KEY = "billing:checkout:expires:{{{user_id}}}:{digest}"
+OPEN_SESSION_KEY = "billing:checkout:open:{{{user_id}}}:{subscription_type_id}:{amount_cents}"
+
+
+def _digest(idempotency_key: str) -> str:
+    # Client-chosen keys can be long or contain anything; the digest keeps
+    # cache keys bounded.
+    return hashlib.sha256(idempotency_key.encode()).hexdigest()
+
+
+def get_checkout_response(user_id: int, idempotency_key: str):
+    return cache.get(CHECKOUT_RESPONSE_KEY.format(
+        user_id=user_id, digest=_digest(idempotency_key),
+    ))
+
+
+def set_checkout_response(user_id: int, idempotency_key: str, fingerprint, payload):
+    cache.set(
+        CHECKOUT_RESPONSE_KEY.format(user_id=user_id, digest=_digest(idempotency_key)),
+        {"request": fingerprint, "response": payload},
+        settings.STRIPE_IDEMPOTENCY_TTL,
+    )
+
+
+async def aget_checkout_response(user_id: int, idempotency_key: str):
+    return await cache_get(CHECKOUT_RESPONSE_KEY.format(
+        user_id=user_id, digest=_digest(idempotency_key),
+    ))
+
+
+async def aset_checkout_response(user_id: int, idempotency_key: str, fingerprint, payload):
+    await cache_set(
+        CHECKOUT_RESPONSE_KEY.format(user_id=user_id, digest=_digest(idempotency_key)),
+        {"request": fingerprint, "response": payload},
+        settings.STRIPE_IDEMPOTENCY_TTL,
+    )
+
+
+def _new_expires_at():
+    return int(time.time()) + settings.STRIPE_CHECKOUT_SESSION_TTL
+
+
+def checkout_expires_at(user_id: int, idempotency_key):
+    """
+    ``expires_at`` of a new checkout session. With an Idempotency-Key the
+    first attempt fixes it, so a retry sends Stripe identical parameters
+    even when it misses the stored response.
+    """
+    expires_at = _new_expires_at()
+    if idempotency_key is None:
+        return expires_at
+    key = CHECKOUT_EXPIRES_KEY.format(user_id=user_id, digest=_digest(idempotency_key))
+    if cache.add(key, expires_at, settings.STRIPE_IDEMPOTENCY_TTL):
+        return expires_at
+    return cache.get(key, expires_at)
+
+
+async def acheckout_expires_at(user_id: int, idempotency_key):
+    expires_at = _new_expires_at()
+    if idempotency_key is None:
+        return expires_at
+    key = CHECKOUT_EXPIRES_KEY.format(user_id=user_id, digest=_digest(idempotency_key))
+    if await cache_add(key, expires_at, settings.STRIPE_IDEMPOTENCY_TTL):
+        return expires_at
+    return await cache_get(key, expires_at)
+
+
+def _open_session_key(user_id, subscription_type_id, amount_cents):
+    return OPEN_SESSION_KEY.format(
+        user_id=user_id,
+        subscription_type_id=subscription_type_id,
+        amount_cents=amount_cents,
+    )
+
+
+def get_open_session(user_id: int, subscription_type_id: int, amount_cents: int):
+    return cache.get(_open_session_key(user_id, subscription_type_id, amount_cents))
+
+
+def set_open_session(user_id: int, subscription_type_id: int, amount_cents: int, payload):
+    # Stop offering the session a few minutes before Stripe expires it.
+    cache.set(
+        _open_session_key(user_id, subscription_type_id, amount_cents),
+        payload,
+        settings.STRIPE_CHECKOUT_SESSION_TTL - settings.STRIPE_CHECKOUT_REUSE_MARGIN,
+    )
+
+
+async def aget_open_session(user_id: int, subscription_type_id: int, amount_cents: int):
+    return await cache_get(_open_session_key(user_id, subscription_type_id, amount_cents))
+
+
+async def aset_open_session(user_id: int, subscription_type_id: int, amount_cents: int, payload):
+    await cache_set(
+        _open_session_key(user_id, subscription_type_id, amount_cents),
+        payload,
+        settings.STRIPE_CHECKOUT_SESSION_TTL - settings.STRIPE_CHECKOUT_REUSE_MARGIN,
+    )
+
+
+def forget_open_session(user_id: int, subscription_type_id: int, amount_cents: int):
+    cache.delete(_open_session_key(user_id, subscription_type_id, amount_cents))
+
+
+async def aforget_open_session(user_id: int, subscription_type_id: int, amount_cents: int):
+    await cache_delete(_open_session_key(user_id, subscription_type_id, amount_cents))
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import socket
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .services import apply_stripe_event
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "billing:stripe:events"
+DEAD_LETTER_KEY = "billing:stripe:events:dead"
+CONSUMER_GROUP = "billing-webhooks"
+PROCESSED_EVENT_KEY = "billing:stripe:event:{event_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def consumer_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def is_processed(event_id) -> bool:
+    """Whether ``event_id`` was already applied, i.e. a delivery is a duplicate."""
+    return bool(_redis().exists(PROCESSED_EVENT_KEY.format(event_id=event_id)))
+
+
+def _mark_processed(client, event_ids):
+    # Only set once the event is applied: a delivery that is queued but lost
+    # (dead-lettered, or its worker died) is still accepted when Stripe retries.
+    pipe = client.pipeline(transaction=False)
+    for event_id in event_ids:
+        pipe.set(PROCESSED_EVENT_KEY.format(event_id=event_id), 1, ex=settings.STRIPE_EVENT_DEDUPE_TTL)
+    pipe.execute()
+
+
+def append_event(payload: bytes):
+    """Durably queue a verified webhook body; returns the stream entry id."""
+    return _redis().xadd(STREAM_KEY, {"payload": payload})
+
+
+def trim_stream(client):
+    """
+    Drop the entries the consumer group is done with: everything below its
+    oldest pending entry, or below its last delivered one when nothing is
+    pending. Entries not yet delivered or acknowledged are never trimmed.
+    """
+    summary = client.xpending(STREAM_KEY, CONSUMER_GROUP)
+    if summary["pending"]:
+        min_id = summary["min"]
+    else:
+        groups = {
+            g["name"]: g for g in client.xinfo_groups(STREAM_KEY)
+        }
+        group = groups.get(CONSUMER_GROUP.encode())
+        if group is None:
+            return 0
+        min_id = group["last-delivered-id"]
+    # Approximate MINID only ever trims less.
+    return client.xtrim(STREAM_KEY, minid=min_id, approximate=True)
+
+
+def ensure_consumer_group(client):
+    try:
+        client.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _dead_letter(client, entry_id, fields, deliveries):
+    client.xadd(
+        DEAD_LETTER_KEY,
+        {"payload": fields[b"payload"], "entry_id": entry_id, "deliveries": deliveries},
+    )
+    client.xack(STREAM_KEY, CONSUMER_GROUP, entry_id)
+    logger.error("Stripe event %s dead-lettered after %s deliveries", entry_id, deliveries)
+
+
+def _reclaim_stale(client, consumer, count):
+    """
+    Take over entries another delivery failed on (or whose consumer died),
+    moving the ones that already used up their deliveries to the dead-letter
+    stream.
+    """
+    pending = client.xpending_range(
+        STREAM_KEY, CONSUMER_GROUP, min="-", max="+", count=count,
+        idle=settings.STRIPE_EVENT_RETRY_IDLE_MS,
+    )
+    if not pending:
+        return []
+
+    retry_ids = []
+    for entry in pending:
+        if entry["times_delivered"] >= settings.STRIPE_EVENT_MAX_DELIVERIES:
+            found = client.xrange(STREAM_KEY, entry["message_id"], entry["message_id"])
+            if found:
+                entry_id, fields = found[0]
+                _dead_letter(client, entry_id, fields, entry["times_delivered"])
+            else:
+                # Trimmed from the stream already; nothing left to retry.
+                client.xack(STREAM_KEY, CONSUMER_GROUP, entry["message_id"])
+        else:
+            retry_ids.append(entry["message_id"])
+
+    if not retry_ids:
+        return []
+    return client.xclaim(
+        STREAM_KEY, CONSUMER_GROUP, consumer,
+        settings.STRIPE_EVENT_RETRY_IDLE_MS, retry_ids,
+    )
+
+
+def consume_events(batch_size=None):
+    """
+    Process one micro-batch: retries of stale pending entries first, then
+    new ones. Successful entries are acknowledged together; failures stay
+    pending and are retried after STRIPE_EVENT_RETRY_IDLE_MS until
+    STRIPE_EVENT_MAX_DELIVERIES is reached. An event is marked processed
+    only once applied, and the stream is then trimmed up to the oldest entry
+    still pending.
+    """
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    client = _redis()
+    consumer = consumer_name()
+    ensure_consumer_group(client)
+
+    entries = _reclaim_stale(client, consumer, batch_size)
+    if len(entries) < batch_size:
+        for _, new_entries in client.xreadgroup(
+            CONSUMER_GROUP, consumer, {STREAM_KEY: ">"},
+            count=batch_size - len(entries),
+        ):
+            entries.extend(new_entries)
+
+    processed = []
+    applied = []
+    failed = 0
+    for entry_id, fields in entries:
+        if fields is None:
+            # Deleted from the stream while pending.
+            processed.append(entry_id)
+            continue
+        try:
+            event = json.loads(fields[b"payload"])
+            # A retry Stripe sent before the first delivery was applied is
+            # queued twice; the second copy is skipped here.
+            if event["id"] in applied or is_processed(event["id"]):
+                processed.append(entry_id)
+                continue
+            apply_stripe_event(event)
+        except Exception:
+            failed += 1
+            logger.exception("Failed to process Stripe event %s", entry_id)
+            continue
+        applied.append(event["id"])
+        processed.append(entry_id)
+
+    if applied:
+        _mark_processed(client, applied)
+    if processed:
+        client.xack(STREAM_KEY, CONSUMER_GROUP, *processed)
+    trim_stream(client)
+
+    return {"processed": len(processed), "failed": failed}
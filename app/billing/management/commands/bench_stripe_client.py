@@ -0,0 +1,114 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import stripe
+
+from billing.stripe_client import CircuitOpenError
+from billing.stripe_http import build_http_client
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """Answers every POST like /v1/checkout/sessions, with injected latency and 5xx."""
+
+    latency = 0.0
+    fail_rate = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            status = 500
+            body = {"error": {"type": "api_error", "message": "fake outage"}}
+        else:
+            status = 200
+            session_id = f"cs_test_{random.getrandbits(48):x}"
+            body = {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"https://checkout.stripe.test/{session_id}",
+            }
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the pooled Stripe client against a local fake Stripe server: "
+        "a healthy phase, then an outage to show the circuit breaker opening "
+        "and calls failing fast."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--latency-ms", type=float, default=20)
+        parser.add_argument("--api-base", help="Use an already running fake server instead.")
+
+    def handle(self, *args, **options):
+        server = None
+        api_base = options["api_base"]
+        if not api_base:
+            FakeStripeHandler.latency = options["latency_ms"] / 1000
+            server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            api_base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        http_client = build_http_client()
+        client = stripe.StripeClient(
+            "sk_test_fake",
+            http_client=http_client,
+            max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+            base_addresses={"api": api_base},
+        )
+        try:
+            self.phase("healthy", client, http_client, options, fail_rate=0.0)
+            self.phase("outage", client, http_client, options, fail_rate=1.0)
+        finally:
+            if server:
+                server.shutdown()
+
+    def phase(self, name, client, http_client, options, fail_rate):
+        FakeStripeHandler.fail_rate = fail_rate
+        outcomes = {"ok": 0, "error": 0, "short-circuited": 0}
+        lock = threading.Lock()
+        per_thread = options["calls"] // options["threads"]
+
+        def worker():
+            for _ in range(per_thread):
+                try:
+                    client.v1.checkout.sessions.create(params={"mode": "payment"})
+                    outcome = "ok"
+                except CircuitOpenError:
+                    outcome = "short-circuited"
+                except stripe.StripeError:
+                    outcome = "error"
+                with lock:
+                    outcomes[outcome] += 1
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{name}: {per_thread * options['threads']} checkouts in {elapsed:.2f}s {outcomes}"
+        )
+        self.stdout.write(
+            f"  http calls: {http_client.stats.snapshot()}, breaker {http_client.breaker.state}"
+        )
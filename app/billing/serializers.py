@@ -1,15 +1,14 @@
 from rest_framework import serializers
-from subscriptions.models import SubscriptionType
+from subscriptions.catalog import get_catalog
 
 class CreateCheckoutSerializer(serializers.Serializer):
     subscription_type_id = serializers.IntegerField()
 
     def validate(self, attrs):
-        try:
-            attrs["subscription_type"] = SubscriptionType.objects.get(
-                id=attrs["subscription_type_id"]
-            )
-        except SubscriptionType.DoesNotExist:
+        # Async views pass the catalog they already awaited.
+        catalog = self.context.get("catalog") or get_catalog()
+        attrs["subscription_type"] = catalog.get(attrs["subscription_type_id"])
+        if attrs["subscription_type"] is None:
             raise serializers.ValidationError("Invalid subscription type ID")
 
         return attrs
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache import forget_open_session
+from subscriptions.catalog import attach_plans, get_catalog
+from subscriptions.locks import lock_user
+from subscriptions.models import UserSubscription
+from subscriptions.pricing import current_subscription
+
+
+def apply_stripe_event(event):
+    """Apply a verified Stripe event to the subscription tables."""
+    if event["type"] == "checkout.session.completed":
+        apply_checkout_session(event["data"]["object"])
+
+
+def apply_checkout_session(session):
+    user_id = int(session["metadata"]["user_id"])
+    type_id = session["metadata"]["subscription_type_id"]
+
+    catalog = get_catalog()
+    sub_type = catalog.get(type_id)
+    if sub_type is None:
+        raise ValueError(f"Unknown subscription type {type_id}")
+
+    if session.get("amount_total") is not None:
+        # The checkout is paid; never hand it out for reuse again.
+        forget_open_session(user_id, sub_type.id, session["amount_total"])
+
+    try:
+        _create_subscription(user_id, sub_type, session, catalog)
+    except IntegrityError:
+        # Same checkout session applied by an earlier delivery: the unique
+        # constraint on stripe_session_id rolled this one back as a whole.
+        if UserSubscription.objects.filter(stripe_session_id=session["id"]).exists():
+            return
+        raise
+
+
+def _create_subscription(user_id, sub_type, session, catalog):
+    now = timezone.now()
+
+    # FK checks are deferred to commit, so a missing user also fails here.
+    with transaction.atomic():
+        lock_user(user_id)
+        current = current_subscription(user_id)
+        if current:
+            attach_plans([current], catalog)
+
+        if not current:
+            start = now
+            is_active = True
+        elif sub_type.monthly_price > current.subscription_type.monthly_price:
+            current.is_active = False
+            current.save()
+            start = now
+            is_active = True
+        else:
+            start = current.end_date
+            is_active = False
+
+        UserSubscription.objects.create(
+            user_id=user_id,
+            subscription_type=sub_type,
+            start_date=start,
+            end_date=start + timedelta(days=30),
+            is_active=is_active,
+            stripe_session_id=session["id"],
+            stripe_payment_intent=session["payment_intent"],
+        )
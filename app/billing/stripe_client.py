@@ -0,0 +1,227 @@
+"""
+Stripe client of this process. stripe-python is imported on the first call,
+not with the views: workers and management commands never need it.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StripeUnavailable(Exception):
+    """Stripe could not be reached; retry after ``retry_after`` seconds if set."""
+
+    retry_after = None
+
+
+class CircuitOpenError(StripeUnavailable):
+    """Stripe calls are short-circuited until ``retry_after`` seconds pass."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Stripe circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class IdempotencyConflict(Exception):
+    """Stripe already saw the Idempotency-Key with different parameters."""
+
+
+class CircuitBreaker:
+    """
+    Error-rate breaker over the last ``window`` calls. Once at least
+    ``min_calls`` of them are recorded and the failure share reaches
+    ``error_rate``, calls fail fast for ``cooldown`` seconds; after that a
+    single trial call is let through and closes the breaker on success.
+
+    ``before_call`` returns a ticket to hand to ``record``. Every state
+    change starts a new generation, and outcomes of calls admitted in an
+    earlier one are ignored: a call that started before the breaker opened
+    can neither close it nor end the running trial.
+    """
+
+    def __init__(self, window, min_calls, error_rate, cooldown):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._generation = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return "open"
+            return "half-open"
+
+    def before_call(self):
+        """``(generation, is_trial)``, or CircuitOpenError if the call may not run."""
+        with self._lock:
+            if self._opened_at is None:
+                return self._generation, False
+            waited = time.monotonic() - self._opened_at
+            if waited < self.cooldown or self._trial_running:
+                raise CircuitOpenError(max(self.cooldown - waited, 1))
+            self._trial_running = True
+            return self._generation, True
+
+    def record(self, ok, ticket):
+        generation, trial = ticket
+        with self._lock:
+            if generation != self._generation:
+                return
+            if trial:
+                self._trial_running = False
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                self._generation += 1
+                return
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.error_rate
+            ):
+                self._opened_at = time.monotonic()
+                self._generation += 1
+                logger.warning(
+                    "Stripe circuit opened: %s of the last %s calls failed",
+                    failures, len(self._outcomes),
+                )
+
+
+class LatencyStats:
+    """Latency (ms) and outcome of the most recent calls."""
+
+    def __init__(self, size=1000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, millis, ok):
+        with self._lock:
+            self._samples.append(millis)
+            self.calls += 1
+            self.errors += not ok
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, errors = self.calls, self.errors
+        if not samples:
+            return {"calls": calls, "errors": errors}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1)
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(samples[-1], 1),
+        }
+
+
+_client = None
+_http_client = None
+_client_lock = threading.Lock()
+
+
+def get_stripe_client():
+    """The process-wide StripeClient; built on first use."""
+    global _client, _http_client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import stripe
+
+                from .stripe_http import build_http_client
+
+                _http_client = build_http_client()
+                _client = stripe.StripeClient(
+                    settings.STRIPE_SECRET_KEY,
+                    http_client=_http_client,
+                    max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+                    base_addresses={"api": settings.STRIPE_API_BASE},
+                )
+    return _client
+
+
+def stripe_client_stats():
+    """Latency percentiles and breaker state of this process' Stripe client."""
+    if _http_client is None:
+        # No Stripe call yet; don't import the SDK just to report that.
+        return {"calls": 0, "errors": 0, "breaker": "closed"}
+    return {**_http_client.stats.snapshot(), "breaker": _http_client.breaker.state}
+
+
+def create_checkout_session(params, options):
+    """
+    ``checkout.sessions.create``, raising StripeUnavailable or
+    IdempotencyConflict for the failures a checkout answers itself.
+    """
+    import stripe
+
+    try:
+        return get_stripe_client().v1.checkout.sessions.create(params=params, options=options)
+    except stripe.APIConnectionError as e:
+        raise StripeUnavailable(str(e)) from e
+    except stripe.IdempotencyError as e:
+        raise IdempotencyConflict(str(e)) from e
+
+
+async def acreate_checkout_session(params, options):
+    import stripe
+
+    try:
+        return await get_stripe_client().v1.checkout.sessions.create_async(
+            params=params, options=options,
+        )
+    except stripe.APIConnectionError as e:
+        raise StripeUnavailable(str(e)) from e
+    except stripe.IdempotencyError as e:
+        raise IdempotencyConflict(str(e)) from e
+
+
+def retrieve_checkout_session(session_id):
+    """``checkout.sessions.retrieve``, raising StripeUnavailable if unreachable."""
+    import stripe
+
+    try:
+        return get_stripe_client().v1.checkout.sessions.retrieve(session_id)
+    except stripe.APIConnectionError as e:
+        raise StripeUnavailable(str(e)) from e
+
+
+async def aretrieve_checkout_session(session_id):
+    import stripe
+
+    try:
+        return await get_stripe_client().v1.checkout.sessions.retrieve_async(session_id)
+    except stripe.APIConnectionError as e:
+        raise StripeUnavailable(str(e)) from e
+
+
+def construct_webhook_event(payload, sig_header, secret):
+    """``stripe.Webhook.construct_event``; raises ValueError for any invalid event."""
+    import stripe
+
+    try:
+        return stripe.Webhook.construct_event(payload, sig_header, secret)
+    except stripe.SignatureVerificationError as e:
+        raise ValueError(str(e)) from e
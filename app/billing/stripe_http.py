@@ -0,0 +1,92 @@
+import random
+import ssl
+import time
+
+import httpx
+import stripe
+from django.conf import settings
+
+from .stripe_client import CircuitBreaker, LatencyStats
+
+
+class PooledHTTPXClient(stripe.HTTPXClient):
+    """
+    stripe-python's httpx transport on one keep-alive pool per process, with
+    explicit timeouts, short jittered retry delays, a circuit breaker and
+    per-call latency recording. Retries themselves are stripe-python's
+    (``max_network_retries``), so only idempotent-safe failures are retried.
+    """
+
+    def __init__(self, breaker, stats):
+        timeout = httpx.Timeout(
+            settings.STRIPE_READ_TIMEOUT,
+            connect=settings.STRIPE_CONNECT_TIMEOUT,
+            pool=settings.STRIPE_CONNECT_TIMEOUT,
+        )
+        super().__init__(timeout=timeout, allow_sync_methods=True)
+        limits = httpx.Limits(
+            max_connections=settings.STRIPE_HTTP_POOL_SIZE,
+            max_keepalive_connections=settings.STRIPE_HTTP_POOL_SIZE,
+        )
+        verify = ssl.create_default_context(cafile=stripe.ca_bundle_path)
+        self._client.close()
+        self._client = httpx.Client(verify=verify, limits=limits, timeout=timeout)
+        # Async views: one pool per worker event loop, sized for many
+        # concurrent checkouts.
+        self._client_async = httpx.AsyncClient(
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=settings.STRIPE_ASYNC_POOL_SIZE,
+                max_keepalive_connections=settings.STRIPE_ASYNC_POOL_SIZE,
+            ),
+            timeout=timeout,
+        )
+        self.breaker = breaker
+        self.stats = stats
+
+    def request(self, method, url, headers, post_data=None):
+        ticket = self.breaker.before_call()
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = super().request(method, url, headers, post_data)
+            ok = response[1] < 500
+            return response
+        finally:
+            millis = (time.perf_counter() - started) * 1000
+            self.breaker.record(ok, ticket)
+            self.stats.record(millis, ok)
+
+    async def request_async(self, method, url, headers, post_data=None):
+        ticket = self.breaker.before_call()
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await super().request_async(method, url, headers, post_data)
+            ok = response[1] < 500
+            return response
+        finally:
+            millis = (time.perf_counter() - started) * 1000
+            self.breaker.record(ok, ticket)
+            self.stats.record(millis, ok)
+
+    def _sleep_time_seconds(self, num_retries, response=None):
+        delay = min(
+            settings.STRIPE_RETRY_BASE_DELAY * 2 ** (num_retries - 1),
+            settings.STRIPE_RETRY_MAX_DELAY,
+        )
+        delay = random.uniform(delay / 2, delay)
+        retry_after = self._retry_after_header(response) or 0
+        return max(delay, min(retry_after, settings.STRIPE_RETRY_MAX_DELAY))
+
+
+def build_http_client() -> PooledHTTPXClient:
+    return PooledHTTPXClient(
+        CircuitBreaker(
+            window=settings.STRIPE_BREAKER_WINDOW,
+            min_calls=settings.STRIPE_BREAKER_MIN_CALLS,
+            error_rate=settings.STRIPE_BREAKER_ERROR_RATE,
+            cooldown=settings.STRIPE_BREAKER_COOLDOWN,
+        ),
+        LatencyStats(),
+    )
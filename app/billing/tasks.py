@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .events import consume_events
+
+
+@shared_task
+def consume_stripe_events():
+    """Drain queued Stripe webhook events in micro-batches."""
+    return consume_events()
@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     CreateStripeCheckoutView,
+    StripeClientStatsView,
     StripeWebhookView,
 )
 
+if settings.ASYNC_VIEWS:
+    from .async_views import CreateStripeCheckoutView  # noqa: F811
+
 urlpatterns = [
     path("checkout/create/", CreateStripeCheckoutView.as_view()),
     path("stripe/webhook/", StripeWebhookView.as_view()),
+    path("stripe/client-stats/", StripeClientStatsView.as_view()),
 ]
@@ -1,17 +1,107 @@
-import stripe
-from datetime import timedelta
 from django.conf import settings
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import generics, status
 from drf_yasg.utils import swagger_auto_schema
+from .cache import (
+    checkout_expires_at,
+    forget_open_session,
+    get_checkout_response,
+    get_open_session,
+    set_checkout_response,
+    set_open_session,
+)
+from .events import append_event, is_processed
 from .serializers import CreateCheckoutSerializer
-from subscriptions.models import SubscriptionType, UserSubscription
+from .stripe_client import (
+    IdempotencyConflict,
+    StripeUnavailable,
+    construct_webhook_event,
+    create_checkout_session,
+    retrieve_checkout_session,
+    stripe_client_stats,
+)
+from subscriptions.catalog import attach_plans
+from subscriptions.models import UserSubscription
+from subscriptions.pricing import current_subscription, quote_plans
 from django.utils import timezone
-from django.contrib.auth import get_user_model
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+# Leaves room for the "checkout:<user id>:" prefix within Stripe's 255 characters.
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+
+
+def checkout_session_params(user, new_type, amount_cents, expires_at):
+    return {
+        "mode": "payment",
+        "expires_at": expires_at,
+        "success_url": settings.FRONTEND_SUCCESS_URL + "?session_id={CHECKOUT_SESSION_ID}",
+        "cancel_url": settings.FRONTEND_CANCEL_URL,
+        "customer_email": user.email,
+        "payment_method_types": ["card"],
+        "line_items": [
+            {
+                "price_data": {
+                    "currency": "mxn",
+                    "unit_amount": amount_cents,
+                    "product_data": {
+                        "name": f"{new_type.name} Subscription",
+                    },
+                },
+                "quantity": 1,
+            }
+        ],
+        "metadata": {
+            "user_id": user.id,
+            "subscription_type_id": new_type.id,
+        },
+    }
+
+
+def can_reuse_session(session):
+    # The webhook that forgets a paid session may not have run yet; only
+    # Stripe knows whether it is still waiting for payment.
+    return session.status == "open" and session.payment_status == "unpaid"
+
+
+def checkout_request_options(user_id, idempotency_key):
+    if idempotency_key is None:
+        return {}
+    # Stripe keys are account-wide, so scope them to the user.
+    return {"idempotency_key": f"checkout:{user_id}:{idempotency_key}"}
+
+
+IDEMPOTENCY_CONFLICT = {"error": "This Idempotency-Key was already used for a different checkout."}
+
+
+def checkout_fingerprint(subscription_type_id, amount_cents):
+    """What an Idempotency-Key is bound to, stored next to its response."""
+    return {"subscription_type_id": subscription_type_id, "amount_cents": amount_cents}
+
+
+def replay_checkout(cached, subscription_type_id):
+    """
+    ``(data, status)`` for a repeated Idempotency-Key: the stored response,
+    or 409 if the key was first used for another plan. The amount is not
+    re-quoted: it is derived on the server and changes once the original
+    checkout is paid, which must not turn a retry into a conflict.
+    """
+    if cached["request"]["subscription_type_id"] != subscription_type_id:
+        return IDEMPOTENCY_CONFLICT, 409
+    return cached["response"], 200
+
+
+STRIPE_ERRORS = (StripeUnavailable, IdempotencyConflict)
+
+
+def stripe_error(e):
+    """``(data, status, headers)`` of the response for one of STRIPE_ERRORS."""
+    if isinstance(e, IdempotencyConflict):
+        return IDEMPOTENCY_CONFLICT, 409, None
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(int(e.retry_after))}
+    return {"error": "Payments are temporarily unavailable. Please try again shortly."}, 503, headers
 
 
 class CreateStripeCheckoutView(APIView):
@@ -24,7 +114,19 @@ class CreateStripeCheckoutView(APIView):
 
         user = request.user
         new_type = serializer.validated_data["subscription_type"]
-        
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key is not None:
+            if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+                return Response(
+                    {"error": f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters."},
+                    status=400
+                )
+            cached = get_checkout_response(user.id, idempotency_key)
+            if cached is not None:
+                data, status_code = replay_checkout(cached, new_type.id)
+                return Response(data, status=status_code)
+
         now = timezone.now()
 
         future_sub_exists = UserSubscription.objects.filter(
@@ -39,50 +141,57 @@ class CreateStripeCheckoutView(APIView):
                 status=400
             )
 
-        current = (
-            UserSubscription.objects.filter(user=user, is_active=True)
-            .order_by("-start_date")
-            .first()
-        )
-
-        remaining_value = 0
+        current = current_subscription(user.id)
         if current:
-            remaining_days = (current.end_date - now).days
-            if remaining_days > 0:
-                daily_price = current.subscription_type.monthly_price / 30
-                remaining_value = daily_price * remaining_days
-
-        discount = remaining_value if current and new_type.monthly_price >= current.subscription_type.monthly_price else 0
-
-        final_price = max(float(new_type.monthly_price) - float(discount), 0)
-
-        amount_cents = int(final_price * 100)
-
-        session = stripe.checkout.Session.create(
-            mode="payment",
-            success_url=settings.FRONTEND_SUCCESS_URL + "?session_id={CHECKOUT_SESSION_ID}",
-            cancel_url=settings.FRONTEND_CANCEL_URL,
-            customer_email=user.email,
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "mxn",
-                        "unit_amount": amount_cents,
-                        "product_data": {
-                            "name": f"{new_type.name} Subscription",
-                        },
-                    },
-                    "quantity": 1,
-                }
-            ],
-            metadata={
-                "user_id": user.id,
-                "subscription_type_id": new_type.id,
-            },
-        )
+            attach_plans([current])
+
+        # A queued change was rejected above, so only the current plan counts.
+        quote = quote_plans(current, None, [new_type], now).plans[new_type.id]
+        amount_cents = quote.amount_cents
+
+        # A session for the same plan and amount that is still open serves
+        # double clicks and retries instead of creating another one.
+        payload = get_open_session(user.id, new_type.id, amount_cents)
+        if payload is not None:
+            try:
+                session = retrieve_checkout_session(payload["session_id"])
+            except STRIPE_ERRORS as e:
+                data, status_code, headers = stripe_error(e)
+                return Response(data, status=status_code, headers=headers)
+            if not can_reuse_session(session):
+                forget_open_session(user.id, new_type.id, amount_cents)
+                payload = None
+
+        if payload is None:
+            try:
+                session = create_checkout_session(
+                    checkout_session_params(
+                        user, new_type, amount_cents,
+                        checkout_expires_at(user.id, idempotency_key),
+                    ),
+                    checkout_request_options(user.id, idempotency_key),
+                )
+            except STRIPE_ERRORS as e:
+                data, status_code, headers = stripe_error(e)
+                return Response(data, status=status_code, headers=headers)
+
+            payload = {"checkout_url": session.url, "session_id": session.id}
+            set_open_session(user.id, new_type.id, amount_cents, payload)
+
+        if idempotency_key is not None:
+            set_checkout_response(
+                user.id, idempotency_key, checkout_fingerprint(new_type.id, amount_cents), payload,
+            )
+
+        return Response(payload)
+
+
+class StripeClientStatsView(APIView):
+    """Stripe call latency and breaker state of the worker serving the request."""
+    permission_classes = [IsAdminUser]
 
-        return Response({"checkout_url": session.url, "session_id": session.id})
+    def get(self, request):
+        return Response(stripe_client_stats())
 
 
 class StripeWebhookView(APIView):
@@ -94,65 +203,17 @@ class StripeWebhookView(APIView):
         endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, endpoint_secret
-            )
+            event = construct_webhook_event(payload, sig_header, endpoint_secret)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
-        if event["type"] == "checkout.session.completed":
-            session = event["data"]["object"]
-
-            user_id = session["metadata"]["user_id"]
-            type_id = session["metadata"]["subscription_type_id"]
-
-            User = get_user_model()
-
-            user = User.objects.get(id=user_id)
-            sub_type = SubscriptionType.objects.get(id=type_id)
+        if is_processed(event["id"]):
+            return Response({"status": "duplicate"})
 
-            now = timezone.now()
-
-            current = (
-                UserSubscription.objects.filter(user=user, is_active=True)
-                .order_by("-start_date")
-                .first()
-            )
-
-            if not current:
-                UserSubscription.objects.create(
-                    user=user,
-                    subscription_type=sub_type,
-                    start_date=now,
-                    end_date=now + timedelta(days=30),
-                    is_active=True,
-                    stripe_session_id=session["id"],
-                    stripe_payment_intent=session["payment_intent"],
-                )
-            else:
-                if sub_type.monthly_price > current.subscription_type.monthly_price:
-                    current.is_active = False
-                    current.save()
-
-                    UserSubscription.objects.create(
-                        user=user,
-                        subscription_type=sub_type,
-                        start_date=now,
-                        end_date=now + timedelta(days=30),
-                        is_active=True,
-                        stripe_session_id=session["id"],
-                        stripe_payment_intent=session["payment_intent"],
-                    )
-                else:
-                    start = current.end_date
-                    UserSubscription.objects.create(
-                        user=user,
-                        subscription_type=sub_type,
-                        start_date=start,
-                        end_date=start + timedelta(days=30),
-                        is_active=False,
-                        stripe_session_id=session["id"],
-                        stripe_payment_intent=session["payment_intent"],
-                    )
+        # Processing happens in billing.tasks.consume_stripe_events; only
+        # durable queuing stays on the request path. Applying an event is
+        # idempotent, so a redelivery queued before the first copy was
+        # processed is harmless.
+        append_event(payload)
 
         return Response({"status": "success"})
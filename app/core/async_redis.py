@@ -0,0 +1,62 @@
+import asyncio
+import weakref
+from django.conf import settings
+from django.core.cache import cache
+from redis import asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+
+from core.redis import connection_options
+
+# redis.asyncio pools are bound to the event loop that created them.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> aioredis.Redis:
+    """redis.asyncio client on the default cache's Redis, one per event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        url = settings.CACHES["default"]["LOCATION"]
+        if settings.REDIS_CLUSTER:
+            client = RedisCluster.from_url(
+                url, max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS,
+                **connection_options(),
+            )
+        else:
+            # Blocking pool: past ASYNC_REDIS_MAX_CONNECTIONS, callers wait
+            # for a free connection instead of failing.
+            pool = aioredis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS,
+                timeout=settings.ASYNC_REDIS_POOL_TIMEOUT,
+                **connection_options(),
+            )
+            client = aioredis.Redis(connection_pool=pool)
+        _clients[loop] = client
+    return client
+
+
+async def cache_get(key, default=None):
+    """Read a value stored through ``django.core.cache.cache``."""
+    value = await get_async_redis().get(cache.client.make_key(key))
+    if value is None:
+        return default
+    return cache.client.decode(value)
+
+
+async def cache_set(key, value, timeout):
+    """Store ``value`` exactly as ``cache.set(key, value, timeout)`` would."""
+    await get_async_redis().set(
+        cache.client.make_key(key), cache.client.encode(value), ex=timeout
+    )
+
+
+async def cache_add(key, value, timeout):
+    """``cache.add``: store ``value`` unless the key exists; True if stored."""
+    return bool(await get_async_redis().set(
+        cache.client.make_key(key), cache.client.encode(value), ex=timeout, nx=True
+    ))
+
+
+async def cache_delete(key):
+    await get_async_redis().delete(cache.client.make_key(key))
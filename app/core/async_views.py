@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
+
+from accounts.authentication import RedisJWTAuthentication, authenticate_async
+
+
+def json_response(data, status=200, headers=None):
+    # DRF's encoder, so Decimals and datetimes render as with Response.
+    return JsonResponse(data, status=status, headers=headers, encoder=JSONEncoder, safe=False)
+
+
+class _Authenticated(RedisJWTAuthentication):
+    """Hands DRF the result of authenticate_async, awaited beforehand."""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+    def authenticate(self, request):
+        return self.result
+
+
+class AsyncAPIView(APIView):
+    """
+    Async counterpart of APIView for the hot read and checkout endpoints.
+    The JWT is checked without blocking the event loop; content negotiation,
+    permissions and throttles are APIView's own (``initial``), run through
+    sync_to_async since they may query the database or the cache.
+    Handlers must be ``async def`` and return a JsonResponse.
+    """
+
+    renderer_classes = [JSONRenderer]
+    parser_classes = [JSONParser]
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.headers = self.default_response_headers
+        try:
+            auth = await authenticate_async(request)
+            failure = None
+        except exceptions.APIException as e:
+            auth, failure = None, e
+
+        request = self.request = Request(
+            request,
+            parsers=self.get_parsers(),
+            authenticators=[_Authenticated(auth)],
+            negotiator=self.get_content_negotiator(),
+            parser_context=self.get_parser_context(request),
+        )
+        try:
+            if failure is not None:
+                raise failure
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            # http_method_not_allowed raises before anything is awaited.
+            response = await handler(request, *args, **kwargs)
+        except Exception as e:
+            response = self.handle_exception(e)
+
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        # APIView.options, awaitable.
+        if self.metadata_class is None:
+            self.http_method_not_allowed(request, *args, **kwargs)
+        return json_response(self.metadata_class().determine_metadata(request, self))
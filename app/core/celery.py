@@ -14,7 +14,23 @@ app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
     'activate-scheduled-subscriptions-every-hour': {
-        'task': 'subscriptions.tasks.activate_scheduled_subscriptions',
+        'task': 'subscriptions.tasks.dispatch_scheduled_subscriptions',
         'schedule': crontab(minute=0),  # every hour at minute 0
     },
+    'process-due-subscription-timers': {
+        'task': 'subscriptions.tasks.process_due_subscription_timers',
+        'schedule': 5.0,  # every 5 seconds
+    },
+    'consume-stripe-events': {
+        'task': 'billing.tasks.consume_stripe_events',
+        'schedule': 2.0,  # every 2 seconds
+    },
+    'send-queued-mail': {
+        'task': 'accounts.tasks.send_queued_mail',
+        'schedule': 30.0,  # every 30 seconds, in case a trigger was lost
+    },
+    'rebuild-subscription-timers-daily': {
+        'task': 'subscriptions.tasks.rebuild_subscription_timers',
+        'schedule': crontab(minute=30, hour=3),
+    },
 }
@@ -0,0 +1,62 @@
+import threading
+import redis
+from django.conf import settings
+from django_redis.pool import ConnectionFactory as DjangoRedisConnectionFactory
+from redis.cluster import RedisCluster
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def connection_options():
+    """Socket and health-check options shared by every Redis client of the project."""
+    return {
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def _connect(url, decode_responses):
+    options = {**connection_options(), "decode_responses": decode_responses}
+    if settings.REDIS_CLUSTER:
+        # url is any node of the cluster; max_connections is per node.
+        return RedisCluster.from_url(
+            url, max_connections=settings.REDIS_MAX_CONNECTIONS, **options
+        )
+    # Past REDIS_MAX_CONNECTIONS callers wait for a free connection instead
+    # of failing.
+    pool = redis.BlockingConnectionPool.from_url(
+        url,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **options,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def get_redis(decode_responses=False, url=None):
+    """
+    Process-wide client for ``url`` (the default cache's Redis by default),
+    a RedisCluster when REDIS_CLUSTER is on. django_redis gets the same
+    client through ConnectionFactory.
+    """
+    url = url or settings.CACHES["default"]["LOCATION"]
+    client = _clients.get((url, decode_responses))
+    if client is None:
+        with _lock:
+            client = _clients.get((url, decode_responses))
+            if client is None:
+                client = _clients[url, decode_responses] = _connect(url, decode_responses)
+    return client
+
+
+class ConnectionFactory(DjangoRedisConnectionFactory):
+    """CACHES OPTIONS CONNECTION_FACTORY: serve django_redis from get_redis()."""
+
+    def connect(self, url):
+        return get_redis(url=url)
+
+    def disconnect(self, connection):
+        # Shared with the rest of the process; never closed by the cache.
+        pass
@@ -1,8 +1,6 @@
 import os
 from datetime import timedelta
 from pathlib import Path
-import firebase_admin
-from firebase_admin import credentials
 import environ
 
 env = environ.Env(
@@ -55,6 +53,7 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'accounts.middleware.PasswordHashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -97,6 +96,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# PBKDF2 cost (Django 5.2's default); hashes with another cost are re-hashed on the next login
+PASSWORD_HASH_ITERATIONS = 1_000_000
+# At most this many password hashes run at once per process (0: no limit, on the request
+# thread, which otherwise waits for the pool). Past PASSWORD_HASH_QUEUE_SIZE waiting calls,
+# logins and password changes get a 503 with Retry-After (accounts.middleware)
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_QUEUE_SIZE = 16
+PASSWORD_HASH_RETRY_AFTER = 1
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -112,18 +127,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SITE_ID = 1
 AUTH_USER_MODEL = 'accounts.Account'
 
+# Every Redis client of the project comes from core/redis.py. With REDIS_CLUSTER on,
+# REDIS_DATABASE_URL is any node of a Redis Cluster (which has no numbered databases)
+REDIS_CLUSTER = env.bool('REDIS_CLUSTER', default=False)
+# Connections per process (per node under REDIS_CLUSTER), and how long to wait for a free one
+REDIS_MAX_CONNECTIONS = 50
+REDIS_POOL_TIMEOUT = 5
+REDIS_SOCKET_TIMEOUT = 5.0
+REDIS_SOCKET_CONNECT_TIMEOUT = 2.0
+# Idle connections are PINGed before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
 CACHES = {
     'default': {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": env('REDIS_DATABASE_URL') + "/1",
+        "LOCATION": env('REDIS_DATABASE_URL') + ("" if REDIS_CLUSTER else "/1"),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_FACTORY": "core.redis.ConnectionFactory",
         }
     }
 }
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
+# Serve /subscriptions/{plans,me,history}/ and /billing/checkout/create/ from the async views
+# (core/async_views.py); only worth it under ASGI (core.asgi with uvicorn or daphne)
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+# Connections per event loop of the redis.asyncio client used by async views
+ASYNC_REDIS_MAX_CONNECTIONS = 100
+ASYNC_REDIS_POOL_TIMEOUT = 5
+
+# Also accept (and lazily move) JWTs whitelisted under the old per-token layout, until manage.py
+# migrate_token_whitelist has run (it records that in Redis and the fallback stops)
+TOKEN_WHITELIST_LEGACY_FALLBACK = env.bool('TOKEN_WHITELIST_LEGACY_FALLBACK', default=True)
+# Per-process LRU of access tokens Redis confirmed (accounts/near_cache.py); revocations are
+# pushed over pub/sub, the TTL only bounds staleness if the subscriber misses one
+TOKEN_WHITELIST_NEAR_CACHE_SIZE = 10000
+TOKEN_WHITELIST_NEAR_CACHE_TTL = 5
+# Accounts resolved by RedisJWTAuthentication are cached (accounts/cache.py) and dropped on every
+# save, delete and queryset update; writes in raw SQL must call accounts.cache.invalidate_users
+ACCOUNT_CACHE_TIMEOUT = 60 * 60
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'accounts.authentication.RedisJWTAuthentication',
@@ -168,26 +213,86 @@ EMAIL_HOST_PASSWORD = env('SMTP_EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = env('SMTP_EMAIL_USE_TLS')
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Account mail is queued in Redis and sent by accounts.tasks.send_queued_mail on the "mail" Celery
+# queue, this many messages per batch over one SMTP connection
+MAIL_OUTBOX_BATCH_SIZE = 100
+MAIL_DRAIN_LOCK_TIMEOUT = 5 * 60
 
 FRONTEND_URL = "http://localhost"
 
 # Celery
-CELERY_BROKER_URL = env('REDIS_DATABASE_URL') + '/0'
-CELERY_RESULT_BACKEND = env('REDIS_DATABASE_URL') +'/0'
+# Celery cannot use Redis Cluster: point the CELERY_REDIS_URL env var at a standalone Redis when
+# REDIS_CLUSTER is on
+CELERY_BROKER_URL = env('CELERY_REDIS_URL', default=env('REDIS_DATABASE_URL')) + '/0'
+CELERY_RESULT_BACKEND = env('CELERY_REDIS_URL', default=env('REDIS_DATABASE_URL')) +'/0'
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'max_connections': REDIS_MAX_CONNECTIONS,
+    'socket_timeout': REDIS_SOCKET_TIMEOUT,
+    'socket_connect_timeout': REDIS_SOCKET_CONNECT_TIMEOUT,
+    'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+}
+CELERY_REDIS_MAX_CONNECTIONS = REDIS_MAX_CONNECTIONS
+CELERY_REDIS_SOCKET_TIMEOUT = REDIS_SOCKET_TIMEOUT
+CELERY_REDIS_SOCKET_CONNECT_TIMEOUT = REDIS_SOCKET_CONNECT_TIMEOUT
+CELERY_REDIS_BACKEND_HEALTH_CHECK_INTERVAL = REDIS_HEALTH_CHECK_INTERVAL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'accounts.tasks.send_queued_mail': {'queue': 'mail'},
+}
+
+# Per-user cache of /subscriptions/me/ and the /subscriptions/plans/ preview
+SUBSCRIPTION_CACHE_TIMEOUT = 60 * 60
+
+# Users handled per UPDATE (and per lock_users call) when the subscription scheduler deactivates
+# ended and activates queued subscriptions
+SUBSCRIPTION_ACTIVATION_BATCH_SIZE = 1000
+# Users per subtask when subscriptions.tasks.dispatch_scheduled_subscriptions fans out
+SUBSCRIPTION_SCHEDULER_SHARD_SIZE = 20000
+# Timer index entries popped per batch by subscriptions.tasks.process_due_subscription_timers
+SUBSCRIPTION_TIMER_BATCH_SIZE = 500
 
 
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET')
+# Verified webhook events are queued in a Redis stream and applied by billing.tasks.consume_stripe_events,
+# which trims the stream up to the oldest entry still pending.
+STRIPE_EVENT_BATCH_SIZE = 100
+STRIPE_EVENT_RETRY_IDLE_MS = 60 * 1000
+STRIPE_EVENT_MAX_DELIVERIES = 5
+# How long processed webhook event ids are remembered (Stripe retries for up to 3 days).
+STRIPE_EVENT_DEDUPE_TTL = 7 * 24 * 60 * 60
+# billing.stripe_client and stripe_http: pooled httpx transport, retries and circuit breaker
+STRIPE_API_BASE = env('STRIPE_API_BASE', default='https://api.stripe.com')
+STRIPE_HTTP_POOL_SIZE = 20
+# Connections of the per-event-loop pool used by async views under ASGI
+STRIPE_ASYNC_POOL_SIZE = 200
+STRIPE_CONNECT_TIMEOUT = 2.0
+STRIPE_READ_TIMEOUT = 10.0
+STRIPE_MAX_NETWORK_RETRIES = 2
+STRIPE_RETRY_BASE_DELAY = 0.25
+STRIPE_RETRY_MAX_DELAY = 2.0
+STRIPE_BREAKER_WINDOW = 20
+STRIPE_BREAKER_MIN_CALLS = 10
+STRIPE_BREAKER_ERROR_RATE = 0.5
+STRIPE_BREAKER_COOLDOWN = 30
+# Checkout sessions expire after STRIPE_CHECKOUT_SESSION_TTL (Stripe allows 30 min to 24 h) and are
+# reused for the same user, plan and amount until STRIPE_CHECKOUT_REUSE_MARGIN before that
+STRIPE_CHECKOUT_SESSION_TTL = 60 * 60
+STRIPE_CHECKOUT_REUSE_MARGIN = 5 * 60
+# Responses replayed for a repeated Idempotency-Key (Stripe keeps its keys for 24 h)
+STRIPE_IDEMPOTENCY_TTL = 24 * 60 * 60
 FRONTEND_SUCCESS_URL = 'http://localhost'
 FRONTEND_CANCEL_URL = 'http://localhost'
 
+# Service account key of the default firebase_admin app, initialized on the first Firebase login
+# (accounts_firebase/verification.py) rather than here, so other processes never import the SDK
 FIREBASE_CERT_PATH = BASE_DIR / "firebase_key.json"
-cred = credentials.Certificate(FIREBASE_CERT_PATH)
-firebase_admin.initialize_app(cred)
+# Google's token signing certificates are refetched in the background this long before their
+# Cache-Control max-age runs out (accounts_firebase/verification.py)
+FIREBASE_CERTS_REFRESH_AHEAD = 5 * 60
 
 CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
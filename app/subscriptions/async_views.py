@@ -0,0 +1,103 @@
+"""
+Async implementations of the read endpoints, enabled with ASYNC_VIEWS.
+Payloads and caching are identical to the APIViews in views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.permissions import AllowAny, IsAuthenticated
+
+from core.async_views import AsyncAPIView, json_response
+from .cache import (
+    aget_my_subscription,
+    aget_plans_preview,
+    aset_my_subscription,
+    aset_plans_preview,
+    seconds_until,
+    seconds_until_day_boundary,
+)
+from .catalog import aget_catalog, attach_plans
+from .fast_serializers import VALUES_FIELDS, serialize_subscription_row
+from .models import UserSubscription
+from .pricing import acurrent_subscription, aqueued_subscription, quote_plans
+from .serializers import SubscriptionTypeSerializer
+from .views import history_pages, history_params_error, history_queryset
+
+
+class SubscriptionTypeListView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request):
+        catalog = await aget_catalog()
+        types = catalog.all()
+        user = request.user
+
+        if not user.is_authenticated:
+            return json_response(SubscriptionTypeSerializer(types, many=True).data)
+
+        cached = await aget_plans_preview(user.id, catalog.version)
+        if cached is not None:
+            return json_response(cached)
+
+        now = timezone.now()
+
+        current = await acurrent_subscription(user.id)
+        queued = await aqueued_subscription(user.id, now)
+        attach_plans([s for s in (current, queued) if s], catalog)
+
+        quotes = quote_plans(current, queued, types, now)
+        payload = quotes.preview()
+
+        timeout = settings.SUBSCRIPTION_CACHE_TIMEOUT
+        if quotes.current_plan:
+            timeout = seconds_until_day_boundary(current.end_date, now)
+        await aset_plans_preview(user.id, catalog.version, payload, timeout)
+
+        return json_response(payload)
+
+
+class MySubscriptionView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        catalog = await aget_catalog()
+        cached = await aget_my_subscription(request.user.id, catalog.version)
+        if cached is not None:
+            return json_response(cached)
+
+        row = await (
+            UserSubscription.objects.filter(user=request.user, is_active=True)
+            .order_by("-start_date")
+            .values(*VALUES_FIELDS)
+            .afirst()
+        )
+
+        timeout = settings.SUBSCRIPTION_CACHE_TIMEOUT
+        if not row:
+            payload = {"detail": "No active subscription."}
+        else:
+            payload = serialize_subscription_row(row, catalog)
+            timeout = seconds_until(row["end_date"], timezone.now())
+
+        if timeout:
+            await aset_my_subscription(request.user.id, catalog.version, payload, timeout)
+        return json_response(payload)
+
+
+class SubscriptionHistoryView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        catalog = await aget_catalog()
+        error = history_params_error(request.GET)
+        if error:
+            return json_response({"detail": error}, status=400)
+
+        # The ORM and CursorPagination are synchronous; build the whole
+        # response in one hop to the ORM thread.
+        bucket = request.GET.get("bucket")
+        subs = history_queryset(request.user, timezone.now())
+        payload = await sync_to_async(history_pages)(
+            request, self, subs, bucket, catalog
+        )
+        return json_response(payload)
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+
+from core.async_redis import cache_get, cache_set
+
+# Hash-tagged by user, so both entries of a user are dropped with one DEL
+# on Redis Cluster too.
+MY_SUBSCRIPTION_KEY = "subscriptions:me:user:{{{user_id}}}"
+PLANS_PREVIEW_KEY = "subscriptions:plans:user:{{{user_id}}}"
+
+
+def _get(key, catalog_version):
+    entry = cache.get(key)
+    # Payloads embed plan data, so entries built against an older plan
+    # catalog are treated as a miss.
+    if entry is None or entry["catalog_version"] != catalog_version:
+        return None
+    return entry["payload"]
+
+
+def _set(key, catalog_version, payload, timeout):
+    cache.set(key, {"catalog_version": catalog_version, "payload": payload}, timeout)
+
+
+async def _aget(key, catalog_version):
+    entry = await cache_get(key)
+    if entry is None or entry["catalog_version"] != catalog_version:
+        return None
+    return entry["payload"]
+
+
+async def _aset(key, catalog_version, payload, timeout):
+    await cache_set(key, {"catalog_version": catalog_version, "payload": payload}, timeout)
+
+
+def get_my_subscription(user_id: int, catalog_version):
+    return _get(MY_SUBSCRIPTION_KEY.format(user_id=user_id), catalog_version)
+
+
+def set_my_subscription(user_id: int, catalog_version, payload, timeout: int):
+    _set(MY_SUBSCRIPTION_KEY.format(user_id=user_id), catalog_version, payload, timeout)
+
+
+def get_plans_preview(user_id: int, catalog_version):
+    return _get(PLANS_PREVIEW_KEY.format(user_id=user_id), catalog_version)
+
+
+def set_plans_preview(user_id: int, catalog_version, payload, timeout: int):
+    _set(PLANS_PREVIEW_KEY.format(user_id=user_id), catalog_version, payload, timeout)
+
+
+async def aget_my_subscription(user_id: int, catalog_version):
+    return await _aget(MY_SUBSCRIPTION_KEY.format(user_id=user_id), catalog_version)
+
+
+async def aset_my_subscription(user_id: int, catalog_version, payload, timeout: int):
+    await _aset(MY_SUBSCRIPTION_KEY.format(user_id=user_id), catalog_version, payload, timeout)
+
+
+async def aget_plans_preview(user_id: int, catalog_version):
+    return await _aget(PLANS_PREVIEW_KEY.format(user_id=user_id), catalog_version)
+
+
+async def aset_plans_preview(user_id: int, catalog_version, payload, timeout: int):
+    await _aset(PLANS_PREVIEW_KEY.format(user_id=user_id), catalog_version, payload, timeout)
+
+
+def invalidate_user_subscription_cache(user_id: int):
+    invalidate_users_subscription_cache([user_id])
+
+
+def invalidate_users_subscription_cache(user_ids):
+    keys = []
+    for user_id in user_ids:
+        keys.append(MY_SUBSCRIPTION_KEY.format(user_id=user_id))
+        keys.append(PLANS_PREVIEW_KEY.format(user_id=user_id))
+    if keys:
+        cache.delete_many(keys)
+
+
+def seconds_until(moment, now) -> int:
+    """
+    Cache timeout that expires an entry no later than ``moment``; 0 when
+    it has already passed. Subscriptions that end are deactivated with a
+    bulk UPDATE, so entries must not outlive the end_date they show.
+    """
+    seconds = int((moment - now).total_seconds())
+    return max(0, min(seconds, settings.SUBSCRIPTION_CACHE_TIMEOUT))
+
+
+def seconds_until_day_boundary(end_date, now) -> int:
+    """
+    Seconds until ``(end_date - now).days`` drops by one, i.e. until
+    ``remaining_days`` in the plans preview changes.
+    """
+    remaining = end_date - now
+    if remaining <= timedelta(0):
+        return settings.SUBSCRIPTION_CACHE_TIMEOUT
+
+    seconds = int((remaining % timedelta(days=1)).total_seconds())
+    return max(1, min(seconds, settings.SUBSCRIPTION_CACHE_TIMEOUT))
@@ -0,0 +1,104 @@
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from core.async_redis import cache_get
+from .models import SubscriptionType
+
+CATALOG_VERSION_KEY = "subscriptions:catalog:version"
+
+
+class PlanCatalog:
+    """
+    Read-only snapshot of every SubscriptionType, keyed by id.
+
+    Instances are shared between requests and threads, so callers must
+    never modify the plans they get from it.
+    """
+
+    def __init__(self, version, plans):
+        self.version = version
+        self._plans = {plan.id: plan for plan in plans}
+
+    def get(self, plan_id):
+        try:
+            return self._plans.get(int(plan_id))
+        except (TypeError, ValueError):
+            return None
+
+    def all(self):
+        return list(self._plans.values())
+
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed with a timestamp so a flushed Redis never hands out a
+        # version some worker has already loaded.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def get_catalog() -> PlanCatalog:
+    """
+    Return this process's catalog, reloading it from the database only
+    when another process has bumped the version in Redis.
+    """
+    global _catalog
+
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = PlanCatalog(
+                version, SubscriptionType.objects.order_by("id")
+            )
+        return _catalog
+
+
+async def aget_catalog() -> PlanCatalog:
+    """get_catalog() for async views: async Redis read and async ORM reload."""
+    global _catalog
+
+    version = await cache_get(CATALOG_VERSION_KEY)
+    if version is None:
+        return await sync_to_async(get_catalog)()
+
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    plans = [plan async for plan in SubscriptionType.objects.order_by("id")]
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = PlanCatalog(version, plans)
+        return _catalog
+
+
+def attach_plans(subscriptions, catalog=None):
+    """
+    Fill ``subscription_type`` from the catalog so serializers and
+    pricing code never trigger the lazy FK query.
+    """
+    catalog = catalog or get_catalog()
+    for subscription in subscriptions:
+        plan = catalog.get(subscription.subscription_type_id)
+        if plan is not None:
+            subscription.subscription_type = plan
+    return subscriptions
@@ -0,0 +1,77 @@
+import threading
+import weakref
+from django.db import models
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .models import UserSubscription
+from .serializers import SubscriptionTypeSerializer, UserSubscriptionSerializer
+
+
+def _datetime(value, tz):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format.
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def _build_field_map():
+    fields = []
+    for name in UserSubscriptionSerializer().fields:
+        model_field = UserSubscription._meta.get_field(name)
+        if name == "subscription_type":
+            kind = "plan"
+        elif isinstance(model_field, models.DateTimeField):
+            kind = "datetime"
+        else:
+            kind = "value"
+        fields.append((name, model_field.attname, kind))
+    return tuple(fields)
+
+
+# (output name, .values() key, converter kind), in serializer field order.
+FIELD_MAP = _build_field_map()
+VALUES_FIELDS = tuple(attname for _, attname, _ in FIELD_MAP)
+
+_plan_payloads = weakref.WeakKeyDictionary()
+_plan_payloads_lock = threading.Lock()
+
+
+def _plan_payload(catalog, plan_id):
+    payloads = _plan_payloads.get(catalog)
+    if payloads is None:
+        with _plan_payloads_lock:
+            payloads = _plan_payloads.setdefault(catalog, {
+                plan.id: dict(SubscriptionTypeSerializer(plan).data)
+                for plan in catalog.all()
+            })
+    return payloads.get(plan_id)
+
+
+def serialize_subscription_rows(rows, catalog=None):
+    """
+    Build the UserSubscriptionSerializer / UserSubscriptionHistorySerializer
+    JSON shape from ``.values(*VALUES_FIELDS)`` rows, taking the nested plan
+    from the catalog. The field list and converters are fixed at import.
+    """
+    catalog = catalog or get_catalog()
+    tz = timezone.get_current_timezone()
+    out = []
+    for row in rows:
+        item = {}
+        for name, attname, kind in FIELD_MAP:
+            value = row[attname]
+            if kind == "datetime":
+                value = _datetime(value, tz)
+            elif kind == "plan":
+                value = _plan_payload(catalog, value)
+            item[name] = value
+        out.append(item)
+    return out
+
+
+def serialize_subscription_row(row, catalog=None):
+    return serialize_subscription_rows([row], catalog)[0]
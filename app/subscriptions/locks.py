@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+from django.db import connection, transaction
+
+# First key of the two-int advisory locks, so these never collide with
+# other advisory locks keyed by a bare integer ("SUBS").
+SUBSCRIPTION_LOCK_CLASS = 0x53554253
+
+
+def _lock_key(user_id):
+    # The second key is an int4. Ids up to 2**31 map to themselves; larger
+    # ones wrap around and at worst share a lock with another user.
+    return (user_id + 2**31) % 2**32 - 2**31
+
+
+def lock_user(user_id):
+    """
+    Take the subscription lock of ``user_id`` until the current transaction
+    ends. Must be called inside ``transaction.atomic()``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, %s)",
+            [SUBSCRIPTION_LOCK_CLASS, _lock_key(user_id)],
+        )
+
+
+def lock_users(user_ids):
+    """
+    Take the subscription locks of several users in one round trip. Locks
+    are always acquired in ascending key order, so two batches sharing
+    users can wait on each other but never deadlock.
+    """
+    keys = sorted({_lock_key(user_id) for user_id in user_ids})
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        # Volatile functions in the select list run after the sort.
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, key) "
+            "FROM unnest(%s::integer[]) AS key ORDER BY key",
+            [SUBSCRIPTION_LOCK_CLASS, keys],
+        )
+
+
+@contextmanager
+def user_subscription_lock(user_id):
+    """
+    Transaction in which ``user_id`` is the only writer of its
+    subscriptions. Other users are never blocked.
+    """
+    with transaction.atomic():
+        lock_user(user_id)
+        yield
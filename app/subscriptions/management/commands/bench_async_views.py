@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.redis_service import whitelist_access_token
+from billing.management.commands.bench_stripe_client import FakeStripeHandler
+from subscriptions.cache import invalidate_users_subscription_cache
+from subscriptions.models import SubscriptionType, UserSubscription
+
+EMAIL = "async-bench-{}@example.invalid"
+READ_ENDPOINTS = ("/subscriptions/me/", "/subscriptions/plans/", "/subscriptions/history/")
+CHECKOUT = "/billing/checkout/create/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync APIViews behind WSGI (a thread pool, "
+        "like gunicorn threads) with the async views behind core.asgi (one "
+        "event loop), in process, with a local fake Stripe server for checkout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200,
+                            help="Seeded users; every one makes one checkout.")
+        parser.add_argument("--requests", type=int, default=1000,
+                            help="Requests per read endpoint.")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Concurrent requests under WSGI.")
+        parser.add_argument("--concurrency", type=int, default=50,
+                            help="Concurrent requests under ASGI; reads hold a Postgres "
+                                 "connection each, so keep it below max_connections.")
+        parser.add_argument("--stripe-latency-ms", type=float, default=150)
+        # Internal: one measured run in a child process.
+        parser.add_argument("--mode", choices=["wsgi", "asgi"], help="")
+        parser.add_argument("--fixture", help="")
+
+    def handle(self, *args, **options):
+        if options["mode"]:
+            return self.measure(options)
+
+        plan, users, tokens = self.seed(options["users"])
+        server = self.fake_stripe(options["stripe_latency_ms"])
+        fixture = json.dumps({
+            "plan_id": plan.id,
+            "tokens": tokens,
+            "stripe": f"http://127.0.0.1:{server.server_address[1]}",
+        })
+        try:
+            for mode in ("wsgi", "asgi"):
+                self.stdout.write(f"{mode}:")
+                env = {**os.environ, "ASYNC_VIEWS": "1" if mode == "asgi" else "0"}
+                args = [
+                    sys.executable, sys.argv[0], "bench_async_views",
+                    "--mode", mode, "--fixture", fixture,
+                    "--requests", str(options["requests"]),
+                    "--threads", str(options["threads"]),
+                    "--concurrency", str(options["concurrency"]),
+                ]
+                # Both modes start cold and pay for every checkout.
+                invalidate_users_subscription_cache([user.id for user in users])
+                cache.delete_pattern("billing:checkout:*")
+                if subprocess.run(args, env=env).returncode:
+                    raise CommandError(f"{mode} run failed.")
+        finally:
+            server.shutdown()
+            get_user_model().objects.filter(id__in=[user.id for user in users]).delete()
+            plan.delete()
+
+    def seed(self, count):
+        User = get_user_model()
+        plan = SubscriptionType.objects.create(
+            name="async-bench", monthly_price=Decimal("10.00"), storage_limit_gb=1,
+        )
+        users = [User.objects.create_user(EMAIL.format(i)) for i in range(count)]
+        now = timezone.now()
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user=user, subscription_type=plan, is_active=True,
+                start_date=now - timedelta(days=10), end_date=now + timedelta(days=20),
+            )
+            for user in users
+        ])
+        tokens = []
+        lifetime = int(settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds())
+        for user in users:
+            token = str(AccessToken.for_user(user))
+            whitelist_access_token(token, lifetime)
+            tokens.append(token)
+        return plan, users, tokens
+
+    @staticmethod
+    def fake_stripe(latency_ms):
+        FakeStripeHandler.latency = latency_ms / 1000
+        FakeStripeHandler.fail_rate = 0.0
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def measure(self, options):
+        fixture = json.loads(options["fixture"])
+        settings.STRIPE_API_BASE = fixture["stripe"]
+        tokens = fixture["tokens"]
+
+        def reads(endpoint):
+            return [
+                ("GET", endpoint, tokens[i % len(tokens)], None)
+                for i in range(options["requests"])
+            ]
+
+        checkouts = [
+            ("POST", CHECKOUT, token, {"subscription_type_id": fixture["plan_id"]})
+            for token in tokens
+        ]
+        workloads = [(endpoint, reads(endpoint)) for endpoint in READ_ENDPOINTS]
+        workloads.append((CHECKOUT, checkouts))
+
+        if options["mode"] == "wsgi":
+            results = self.run_wsgi(workloads, options["threads"])
+        else:
+            results = asyncio.run(self.run_asgi(workloads, options["concurrency"]))
+
+        for endpoint, count, errors, elapsed in results:
+            self.stdout.write(
+                f"  {endpoint:<28} {count:>6} req {elapsed:>7.2f}s "
+                f"{count / elapsed:>8.0f} req/s  errors {errors}"
+            )
+
+    @staticmethod
+    def run_wsgi(workloads, threads):
+        from django.core.wsgi import get_wsgi_application
+
+        client = httpx.Client(
+            transport=httpx.WSGITransport(app=get_wsgi_application()),
+            base_url="http://testserver",
+        )
+
+        def send(request):
+            method, path, token, body = request
+            return client.request(
+                method, path, json=body,
+                headers={"Authorization": f"Bearer {token}"},
+            ).status_code
+
+        results = []
+        with ThreadPoolExecutor(threads) as pool:
+            for endpoint, requests in workloads:
+                started = time.perf_counter()
+                statuses = list(pool.map(send, requests))
+                elapsed = time.perf_counter() - started
+                errors = sum(status >= 400 for status in statuses)
+                results.append((endpoint, len(requests), errors, elapsed))
+        return results
+
+    @staticmethod
+    async def run_asgi(workloads, concurrency):
+        from core.asgi import application
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application),
+            base_url="http://testserver",
+        )
+        limit = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            method, path, token, body = request
+            async with limit:
+                response = await client.request(
+                    method, path, json=body,
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            return response.status_code
+
+        results = []
+        for endpoint, requests in workloads:
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(send(request) for request in requests))
+            elapsed = time.perf_counter() - started
+            errors = sum(status >= 400 for status in statuses)
+            results.append((endpoint, len(requests), errors, elapsed))
+        await client.aclose()
+        return results
@@ -0,0 +1,73 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from subscriptions.catalog import PlanCatalog
+from subscriptions.fast_serializers import VALUES_FIELDS, serialize_subscription_rows
+from subscriptions.models import SubscriptionType, UserSubscription
+from subscriptions.serializers import UserSubscriptionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare UserSubscriptionSerializer with the precompiled fast path "
+        "on in-memory rows (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        plan = SubscriptionType(
+            id=1, name="Pro", monthly_price=Decimal("19.99"),
+            storage_limit_gb=100, has_premium_features=True,
+        )
+        catalog = PlanCatalog("bench", [plan])
+        now = timezone.now()
+
+        self.stdout.write(f"{'rows':>8} {'serializer ms':>15} {'fast ms':>10} {'speedup':>8}")
+        for size in options["sizes"]:
+            instances = [
+                UserSubscription(
+                    id=i, user_id=i, subscription_type=plan,
+                    start_date=now - timedelta(days=i % 60),
+                    end_date=now + timedelta(days=30 - i % 60),
+                    is_active=i % 2 == 0,
+                    stripe_session_id=f"cs_test_{i}",
+                    created_at_utc=now, updated_at_utc=now,
+                )
+                for i in range(1, size + 1)
+            ]
+            rows = [
+                {field: getattr(instance, field) for field in VALUES_FIELDS}
+                for instance in instances
+            ]
+
+            slow = UserSubscriptionSerializer(instances, many=True).data
+            fast = serialize_subscription_rows(rows, catalog)
+            if [dict(item) for item in slow] != fast:
+                raise CommandError(f"Payloads differ for {size} rows.")
+
+            slow_ms = self.best_of(
+                options["repeat"],
+                lambda: UserSubscriptionSerializer(instances, many=True).data,
+            )
+            fast_ms = self.best_of(
+                options["repeat"],
+                lambda: serialize_subscription_rows(rows, catalog),
+            )
+            self.stdout.write(
+                f"{size:>8} {slow_ms:>15.3f} {fast_ms:>10.3f} {slow_ms / fast_ms:>7.1f}x"
+            )
+
+    @staticmethod
+    def best_of(repeat, func):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
@@ -0,0 +1,121 @@
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from subscriptions.models import SubscriptionType, UserSubscription
+
+TABLE = UserSubscription._meta.db_table
+
+
+class _Rollback(Exception):
+    pass
+
+
+def hot_queries(user_id, now):
+    """The UserSubscription access patterns every index is meant to serve."""
+    return {
+        "current subscription (user, is_active)": (
+            UserSubscription.objects.filter(user_id=user_id, is_active=True)
+            .order_by("-start_date")[:1]
+        ),
+        "queued subscription (user, start_date > now)": (
+            UserSubscription.objects.filter(user_id=user_id, start_date__gt=now)
+            .order_by("start_date")[:1]
+        ),
+        "ended subscriptions (is_active, end_date <= now)": (
+            UserSubscription.objects.filter(is_active=True, end_date__lte=now)
+        ),
+        "due subscriptions (not is_active, start_date <= now < end_date)": (
+            UserSubscription.objects.filter(
+                is_active=False, start_date__lte=now, end_date__gt=now
+            )
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the hot UserSubscription queries against a seeded "
+        "table and fail if any of them uses a sequential scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000,
+                            help="Subscriptions to seed (rolled back afterwards).")
+        parser.add_argument("--users", type=int, default=20_000)
+        parser.add_argument("--no-seed", action="store_true",
+                            help="Explain against the existing data only.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("EXPLAIN checks require PostgreSQL.")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                if options["no_seed"]:
+                    user_id = UserSubscription.objects.values_list("user_id", flat=True).first() or 0
+                else:
+                    user_id = self.seed(options["rows"], options["users"])
+
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {TABLE}")
+
+                for name, queryset in hot_queries(user_id, timezone.now()).items():
+                    plan = queryset.explain()
+                    if f"Seq Scan on {TABLE}" in plan:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(f"SEQ SCAN  {name}"))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"OK        {name}"))
+                    self.stdout.write(plan + "\n")
+
+                # Never keep the seeded rows.
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(
+                "Sequential scan on: " + ", ".join(failures)
+            )
+
+    def seed(self, rows, users):
+        User = get_user_model()
+        plan = SubscriptionType.objects.create(
+            name="explain-seed", monthly_price="1.00", storage_limit_gb=1
+        )
+        User.objects.bulk_create(
+            (User(email=f"explain-seed-{i}@example.invalid", username=f"explain-seed-{i}")
+             for i in range(users)),
+            batch_size=5_000,
+        )
+        user_ids = list(
+            User.objects.filter(email__startswith="explain-seed-")
+            .values_list("id", flat=True)
+        )
+
+        now = timezone.now()
+        rng = random.Random(0)
+        batch = []
+        for i in range(rows):
+            start = now - timedelta(days=rng.randint(-60, 3_000))
+            end = start + timedelta(days=30)
+            batch.append(UserSubscription(
+                user_id=rng.choice(user_ids),
+                subscription_type=plan,
+                start_date=start,
+                end_date=end,
+                # Mostly history, like a long-lived production table.
+                is_active=start <= now < end and rng.random() < 0.9,
+            ))
+            if len(batch) == 5_000:
+                UserSubscription.objects.bulk_create(batch)
+                batch = []
+        UserSubscription.objects.bulk_create(batch)
+
+        self.stdout.write(f"Seeded {rows} subscriptions for {users} users.")
+        return user_ids[0]
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from subscriptions.models import SubscriptionType, UserSubscription
+from subscriptions.scheduler import activate_due, deactivate_ended
+from subscriptions.views import PurchaseSubscriptionView
+
+EMAIL = "lock-stress-{}@example.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent purchases and scheduler batches at a few users from "
+        "many threads, then check that no user ended up with more than one "
+        "active or more than one queued subscription. Uses committed data, "
+        "which is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--users", type=int, default=8,
+                            help="Few users for many threads means heavy contention.")
+        parser.add_argument("--iterations", type=int, default=50,
+                            help="Requests per thread.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Advisory locks require PostgreSQL.")
+
+        User = get_user_model()
+        plans = [
+            SubscriptionType.objects.create(
+                name=f"lock-stress-{price}", monthly_price=Decimal(price),
+                storage_limit_gb=1,
+            )
+            for price in ("10.00", "20.00", "30.00")
+        ]
+        users = [User.objects.create_user(EMAIL.format(i)) for i in range(options["users"])]
+
+        try:
+            statuses, elapsed = self.run_threads(users, plans, options)
+            self.report(users, statuses, elapsed, options)
+        finally:
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            SubscriptionType.objects.filter(id__in=[plan.id for plan in plans]).delete()
+
+    def run_threads(self, users, plans, options):
+        factory = APIRequestFactory()
+        view = PurchaseSubscriptionView.as_view()
+        scope = Q(user_id__in=[user.id for user in users])
+        statuses = Counter()
+        statuses_lock = threading.Lock()
+        errors = []
+        start = threading.Barrier(options["threads"])
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = Counter()
+            try:
+                start.wait()
+                for _ in range(options["iterations"]):
+                    if rng.random() < 0.1:
+                        now = timezone.now()
+                        deactivate_ended(now, scope)
+                        activate_due(now, scope)
+                        local["scheduler"] += 1
+                        continue
+                    request = factory.post(
+                        "/subscriptions/purchase/",
+                        {"subscription_type_id": rng.choice(plans).id},
+                        format="json",
+                    )
+                    force_authenticate(request, user=rng.choice(users))
+                    local[view(request).status_code] += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+                with statuses_lock:
+                    statuses.update(local)
+
+        threads = [
+            threading.Thread(target=worker, args=(seed,))
+            for seed in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f"{len(errors)} thread(s) failed, first: {errors[0]!r}")
+        return statuses, elapsed
+
+    def report(self, users, statuses, elapsed, options):
+        now = timezone.now()
+        per_user = (
+            UserSubscription.objects
+            .filter(user__in=users)
+            .values("user_id")
+            .annotate(
+                active=Count("id", filter=Q(is_active=True)),
+                queued=Count("id", filter=Q(start_date__gt=now)),
+            )
+        )
+        broken = [row for row in per_user if row["active"] > 1 or row["queued"] > 1]
+
+        total = sum(statuses.values())
+        self.stdout.write(
+            f"{options['threads']} threads x {options['iterations']} ops on "
+            f"{len(users)} users: {total} ops in {elapsed:.2f}s "
+            f"({total / elapsed:.0f} ops/s)"
+        )
+        for key, count in sorted(statuses.items(), key=str):
+            self.stdout.write(f"  {key}: {count}")
+
+        if broken:
+            raise CommandError(f"Invariant violated for {len(broken)} user(s): {broken[:5]}")
+        self.stdout.write(self.style.SUCCESS("At most one active and one queued subscription per user."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'is_active', '-start_date'], name='usersub_user_active_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'start_date'], name='usersub_user_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_date'], name='usersub_active_end_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['end_date', 'start_date'], name='usersub_inactive_end_idx'),
+        ),
+    ]
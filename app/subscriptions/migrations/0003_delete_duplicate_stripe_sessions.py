@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def delete_duplicate_sessions(apps, schema_editor):
+    # A webhook delivered twice could create a second subscription for the
+    # same checkout session. Keep the first one of each session so the
+    # unique index in 0004 can be built; the others were never paid for.
+    # Timers left for deleted rows only make the scheduler look at the user.
+    UserSubscription = apps.get_model("subscriptions", "UserSubscription")
+    duplicates = list(
+        UserSubscription.objects.filter(stripe_session_id__isnull=False)
+        .values("stripe_session_id")
+        .annotate(rows=Count("id"), first_id=Min("id"))
+        .filter(rows__gt=1)
+        .values_list("stripe_session_id", "first_id")
+    )
+    for start in range(0, len(duplicates), 1000):
+        batch = duplicates[start:start + 1000]
+        UserSubscription.objects.filter(
+            stripe_session_id__in=[session_id for session_id, _ in batch],
+        ).exclude(id__in=[first_id for _, first_id in batch]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_usersubscription_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_sessions, migrations.RunPython.noop),
+    ]
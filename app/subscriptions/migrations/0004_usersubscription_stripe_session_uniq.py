@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0003_delete_duplicate_stripe_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # AddConstraint would build the index under a lock that blocks
+        # writes to the table; build the same partial unique index
+        # concurrently instead, as 0002 does for the plain indexes.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "usersub_stripe_session_uniq" '
+                    'ON "subscriptions_usersubscription" ("stripe_session_id") '
+                    'WHERE "stripe_session_id" IS NOT NULL',
+                    'DROP INDEX CONCURRENTLY IF EXISTS "usersub_stripe_session_uniq"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='usersubscription',
+                    constraint=models.UniqueConstraint(condition=models.Q(('stripe_session_id__isnull', False)), fields=('stripe_session_id',), name='usersub_stripe_session_uniq'),
+                ),
+            ],
+        ),
+    ]
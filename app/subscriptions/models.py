@@ -45,5 +45,41 @@ class UserSubscription(models.Model):
     created_at_utc = models.DateTimeField(default=timezone.now)
     updated_at_utc = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # A checkout session pays for exactly one subscription; this is
+            # the durable backstop behind the webhook event-id registry.
+            models.UniqueConstraint(
+                fields=["stripe_session_id"],
+                condition=models.Q(stripe_session_id__isnull=False),
+                name="usersub_stripe_session_uniq",
+            ),
+        ]
+        indexes = [
+            # Current plan of a user: (user, is_active) ordered by start_date.
+            models.Index(
+                fields=["user", "is_active", "-start_date"],
+                name="usersub_user_active_start_idx",
+            ),
+            # Queued plans of a user: (user, start_date > now).
+            models.Index(
+                fields=["user", "start_date"],
+                name="usersub_user_start_idx",
+            ),
+            # Scheduler: active subscriptions that have ended.
+            models.Index(
+                fields=["end_date"],
+                condition=models.Q(is_active=True),
+                name="usersub_active_end_idx",
+            ),
+            # Scheduler: queued subscriptions that have not ended yet; end_date
+            # leads because start_date <= now matches nearly all history.
+            models.Index(
+                fields=["end_date", "start_date"],
+                condition=models.Q(is_active=False),
+                name="usersub_inactive_end_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.subscription_type.name}"
@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from .catalog import attach_plans, get_catalog
+from .models import UserSubscription
+
+DAYS_PER_PERIOD = 30
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+def money(value) -> Decimal:
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def cents(amount) -> int:
+    """``amount`` in whole cents, as Stripe expects it."""
+    return int((money(amount) * 100).to_integral_value())
+
+
+@dataclass(frozen=True)
+class PlanQuote:
+    plan: object
+    discount: Decimal
+    gap_charge: Decimal
+    final_price: Decimal
+
+    @property
+    def amount_cents(self) -> int:
+        return cents(self.final_price)
+
+
+@dataclass(frozen=True)
+class Quotes:
+    current_plan: object
+    remaining_days: int
+    remaining_value: Decimal
+    plans: dict
+
+    def preview(self):
+        """Payload of the authenticated /subscriptions/plans/ preview."""
+        return {
+            "current_subscription": self.current_plan.name if self.current_plan else None,
+            "remaining_days": self.remaining_days,
+            "remaining_value": self.remaining_value,
+            "subscription_types": [
+                {
+                    "id": quote.plan.id,
+                    "name": quote.plan.name,
+                    "monthly_price": quote.plan.monthly_price,
+                    "storage_limit_gb": quote.plan.storage_limit_gb,
+                    "has_premium_features": quote.plan.has_premium_features,
+                    "discount": quote.discount,
+                    "gap_charge": quote.gap_charge,
+                    "final_price": quote.final_price,
+                }
+                for quote in self.plans.values()
+            ],
+        }
+
+
+def daily_price(plan) -> Decimal:
+    return plan.monthly_price / DAYS_PER_PERIOD
+
+
+def quote_plans(current, queued, plans, now) -> Quotes:
+    """
+    Price every plan in ``plans`` for a user whose active subscription is
+    ``current`` and whose next queued one is ``queued`` (either may be None).
+    This is the only pricing rule: the preview, purchase, checkout and the
+    staff batch quotes all charge what it returns.
+
+    * no current plan, the current plan itself, or a cheaper plan: full price
+      (renewals and downgrades are queued behind the current period);
+    * a plan at least as expensive: the unused whole days of the current
+      plan are discounted;
+    * a more expensive plan while a renewal of the current plan is queued:
+      the upgrade replaces both periods, so the queued days are charged on
+      top instead (the gap charge).
+
+    Amounts are Decimals rounded half up to the cent, and ``final_price``
+    is exactly the price plus the gap charge minus the discount.
+    """
+    current_plan = None
+    remaining_days = 0
+    remaining = ZERO
+    if current and current.end_date > now:
+        current_plan = current.subscription_type
+        remaining_days = (current.end_date - now).days
+        if remaining_days > 0:
+            remaining = money(daily_price(current.subscription_type) * remaining_days)
+
+    gap_charge = ZERO
+    if current and queued:
+        gap_days = (queued.end_date - now).days
+        gap_charge = money(daily_price(current.subscription_type) * gap_days)
+
+    quotes = {}
+    for plan in plans:
+        discount = ZERO
+        gap = ZERO
+
+        if current and plan.id != current.subscription_type_id:
+            current_price = current.subscription_type.monthly_price
+            renewal_queued = (
+                queued is not None
+                and queued.subscription_type_id == current.subscription_type_id
+            )
+            if renewal_queued and plan.monthly_price > current_price:
+                gap = gap_charge
+            elif plan.monthly_price >= current_price:
+                discount = remaining
+
+        quotes[plan.id] = PlanQuote(
+            plan=plan,
+            discount=discount,
+            gap_charge=gap,
+            final_price=max(money(plan.monthly_price) + gap - discount, ZERO),
+        )
+
+    return Quotes(
+        current_plan=current_plan,
+        remaining_days=remaining_days,
+        remaining_value=remaining,
+        plans=quotes,
+    )
+
+
+def current_subscription(user_id):
+    return (
+        UserSubscription.objects.filter(user_id=user_id, is_active=True)
+        .order_by("-start_date")
+        .first()
+    )
+
+
+def queued_subscription(user_id, now):
+    return (
+        UserSubscription.objects.filter(user_id=user_id, start_date__gt=now)
+        .order_by("start_date")
+        .first()
+    )
+
+
+async def acurrent_subscription(user_id):
+    return await (
+        UserSubscription.objects.filter(user_id=user_id, is_active=True)
+        .order_by("-start_date")
+        .afirst()
+    )
+
+
+async def aqueued_subscription(user_id, now):
+    return await (
+        UserSubscription.objects.filter(user_id=user_id, start_date__gt=now)
+        .order_by("start_date")
+        .afirst()
+    )
+
+
+def quote_users(user_ids, now, plans=None):
+    """
+    Quotes for many users with two bulk queries in total: one DISTINCT ON
+    for the current subscriptions and one for the queued ones.
+
+    Returns ``{user_id: Quotes}``.
+    """
+    catalog = get_catalog()
+    plans = plans if plans is not None else catalog.all()
+
+    current = {
+        sub.user_id: sub
+        for sub in attach_plans(
+            UserSubscription.objects
+            .filter(user_id__in=user_ids, is_active=True)
+            .order_by("user_id", "-start_date")
+            .distinct("user_id"),
+            catalog,
+        )
+    }
+    queued = {
+        sub.user_id: sub
+        for sub in attach_plans(
+            UserSubscription.objects
+            .filter(user_id__in=user_ids, start_date__gt=now)
+            .order_by("user_id", "start_date")
+            .distinct("user_id"),
+            catalog,
+        )
+    }
+
+    return {
+        user_id: quote_plans(current.get(user_id), queued.get(user_id), plans, now)
+        for user_id in user_ids
+    }
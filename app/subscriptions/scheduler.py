@@ -0,0 +1,166 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .cache import invalidate_users_subscription_cache
+from .locks import lock_users
+from .models import UserSubscription
+
+
+def _has_active_subscription():
+    return Exists(
+        UserSubscription.objects.filter(user_id=OuterRef("user_id"), is_active=True)
+    )
+
+
+def deactivate_ended(now, scope=Q(), batch_size=None) -> int:
+    """
+    Deactivate every active subscription whose end_date has passed, one
+    UPDATE per ``batch_size`` users in id order. Cached payloads already
+    expire at end_date, so no per-user invalidation is needed here.
+    """
+    batch_size = batch_size or settings.SUBSCRIPTION_ACTIVATION_BATCH_SIZE
+    deactivated = 0
+    last_user_id = 0
+
+    while True:
+        user_ids = list(
+            UserSubscription.objects
+            .filter(scope, is_active=True, end_date__lte=now, user_id__gt=last_user_id)
+            .values_list("user_id", flat=True)
+            .distinct()
+            .order_by("user_id")[:batch_size]
+        )
+        if not user_ids:
+            break
+
+        with transaction.atomic():
+            # Same locks as activate_due: a purchase or webhook of these
+            # users never sees their current plan end under it.
+            lock_users(user_ids)
+            deactivated += (
+                UserSubscription.objects
+                .filter(scope, user_id__in=user_ids, is_active=True, end_date__lte=now)
+                .update(is_active=False, updated_at_utc=now)
+            )
+
+        last_user_id = user_ids[-1]
+
+    return deactivated
+
+
+def activate_due(now, scope=Q(), batch_size=None):
+    """
+    Activate the earliest queued subscription of every user without an
+    active one, walking users in id order ``batch_size`` at a time so
+    memory stays bounded however large the backlog is.
+
+    Returns ``(activated, batches)``.
+    """
+    batch_size = batch_size or settings.SUBSCRIPTION_ACTIVATION_BATCH_SIZE
+    activated = 0
+    batches = 0
+    last_user_id = 0
+
+    while True:
+        # DISTINCT ON (user_id) keeps the earliest eligible row per user.
+        rows = list(
+            UserSubscription.objects
+            .filter(
+                scope,
+                is_active=False,
+                start_date__lte=now,
+                end_date__gt=now,
+                user_id__gt=last_user_id,
+            )
+            .filter(~_has_active_subscription())
+            .order_by("user_id", "start_date")
+            .distinct("user_id")
+            .values_list("id", "user_id")[:batch_size]
+        )
+        if not rows:
+            break
+
+        ids = [row[0] for row in rows]
+        user_ids = [row[1] for row in rows]
+
+        with transaction.atomic():
+            # Purchases and webhooks for these users wait until this batch
+            # commits; the UPDATE re-checks in case one of them activated
+            # something since the batch was selected.
+            lock_users(user_ids)
+            activated += (
+                UserSubscription.objects
+                .filter(id__in=ids, is_active=False)
+                .filter(~_has_active_subscription())
+                .update(is_active=True, updated_at_utc=now)
+            )
+            transaction.on_commit(
+                lambda user_ids=user_ids: invalidate_users_subscription_cache(user_ids)
+            )
+
+        batches += 1
+        last_user_id = user_ids[-1]
+
+    return activated, batches
+
+
+def due_filter(now):
+    """Rows the scheduler has to act on: ended active ones and due queued ones."""
+    return (
+        Q(is_active=True, end_date__lte=now)
+        | Q(is_active=False, start_date__lte=now, end_date__gt=now)
+    )
+
+
+def user_range(start_user_id, end_user_id=None):
+    """Scope for the users with ``start_user_id <= user_id < end_user_id``."""
+    scope = Q(user_id__gte=start_user_id)
+    if end_user_id is not None:
+        scope &= Q(user_id__lt=end_user_id)
+    return scope
+
+
+def plan_shards(now, shard_size=None):
+    """
+    Split the users with due rows into contiguous user-id ranges of at
+    most ``shard_size`` users each, as ``[(start, end), ...]`` with the
+    last range open-ended (``end`` is None). Ranges never overlap, so every
+    user is handled by exactly one shard.
+    """
+    shard_size = shard_size or settings.SUBSCRIPTION_SCHEDULER_SHARD_SIZE
+    due_users = (
+        UserSubscription.objects
+        .filter(due_filter(now))
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+    start = due_users.first()
+    shards = []
+    while start is not None:
+        # First user of the next shard, found with one OFFSET query per shard.
+        boundary = list(due_users.filter(user_id__gte=start)[shard_size:shard_size + 1])
+        end = boundary[0] if boundary else None
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def run_scheduler(now, scope=Q()):
+    started = time.monotonic()
+    deactivated = deactivate_ended(now, scope)
+    deactivated_at = time.monotonic()
+    activated, batches = activate_due(now, scope)
+    finished = time.monotonic()
+
+    return {
+        "deactivated": deactivated,
+        "activated": activated,
+        "batches": batches,
+        "deactivate_seconds": round(deactivated_at - started, 3),
+        "activate_seconds": round(finished - deactivated_at, 3),
+        "total_seconds": round(finished - started, 3),
+    }
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .catalog import get_catalog
 from .models import SubscriptionType, UserSubscription
 
 
@@ -20,12 +21,8 @@ class PurchaseSubscriptionSerializer(serializers.Serializer):
     subscription_type_id = serializers.IntegerField()
 
     def validate(self, attrs):
-        from .models import SubscriptionType
-        try:
-            attrs["subscription_type"] = SubscriptionType.objects.get(
-                id=attrs["subscription_type_id"]
-            )
-        except SubscriptionType.DoesNotExist:
+        attrs["subscription_type"] = get_catalog().get(attrs["subscription_type_id"])
+        if attrs["subscription_type"] is None:
             raise serializers.ValidationError("Invalid subscription type ID")
         return attrs
 
@@ -35,3 +32,19 @@ class UserSubscriptionHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSubscription
         fields = "__all__"
+
+
+class BatchQuoteSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=10000
+    )
+    subscription_type_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    def validate_subscription_type_ids(self, value):
+        catalog = get_catalog()
+        plans = [catalog.get(plan_id) for plan_id in value]
+        if None in plans:
+            raise serializers.ValidationError("Invalid subscription type ID")
+        return value
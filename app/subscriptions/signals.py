@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_user_subscription_cache
+from .catalog import bump_catalog_version
+from .models import SubscriptionType, UserSubscription
+from .timers import register_subscription_timers, remove_subscription_timers
+
+
+@receiver([post_save, post_delete], sender=UserSubscription)
+def invalidate_subscription_cache(sender, instance, **kwargs):
+    user_id = instance.user_id
+    # Drop the entry once the write is visible, so a concurrent read
+    # cannot repopulate the cache with the pre-commit state. robust: the
+    # write already committed, so a Redis error is logged rather than
+    # turned into a 500 the client would retry.
+    transaction.on_commit(lambda: invalidate_user_subscription_cache(user_id), robust=True)
+
+
+@receiver(post_save, sender=UserSubscription)
+def register_timers(sender, instance, **kwargs):
+    transaction.on_commit(lambda: register_subscription_timers([instance]), robust=True)
+
+
+@receiver(post_delete, sender=UserSubscription)
+def remove_timers(sender, instance, **kwargs):
+    subscription_id, user_id = instance.id, instance.user_id
+    transaction.on_commit(lambda: remove_subscription_timers(subscription_id, user_id), robust=True)
+
+
+@receiver([post_save, post_delete], sender=SubscriptionType)
+def invalidate_plan_catalog(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version, robust=True)
@@ -1,8 +1,14 @@
-from celery import shared_task
-from django.utils import timezone
-from django.db import transaction
+import logging
+from datetime import datetime
+from celery import chord, shared_task
+from django.conf import settings
 from django.db.models import Q
-from .models import UserSubscription
+from django.utils import timezone
+
+from .scheduler import plan_shards, run_scheduler, user_range
+from .timers import pop_due_timers, rebuild_timer_index, restore_timers
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -11,35 +17,96 @@ def activate_scheduled_subscriptions():
     1. Deactivate subscriptions whose end_date has already passed.
     2. Activate subscriptions whose start_date has arrived (UTC),
        only if the user has no other active subscription.
+
+    Both steps are set-based; returns counts and timings.
+    """
+    return run_scheduler(timezone.now())
+
+
+@shared_task
+def dispatch_scheduled_subscriptions():
+    """
+    Coordinator mode: split the due rows into user-id ranges and run one
+    process_subscription_shard per range in parallel, then aggregate the
+    per-shard results in aggregate_subscription_shards.
     """
     now = timezone.now()
+    shards = plan_shards(now)
+    if not shards:
+        return {"shards": 0}
+
+    header = [
+        process_subscription_shard.s(now.isoformat(), start, end)
+        for start, end in shards
+    ]
+    result = chord(header)(aggregate_subscription_shards.s(now.isoformat()))
+    return {"shards": len(shards), "chord_id": result.id}
+
 
-    ended_qs = UserSubscription.objects.filter(
-        end_date__lte=now,
-        is_active=True
+@shared_task
+def process_subscription_shard(now, start_user_id, end_user_id):
+    stats = run_scheduler(
+        datetime.fromisoformat(now), user_range(start_user_id, end_user_id)
     )
+    stats["start_user_id"] = start_user_id
+    stats["end_user_id"] = end_user_id
+    return stats
+
 
-    for ended in ended_qs.select_related('user'):
-        ended.is_active = False
-        ended.save()
-
-    candidates = UserSubscription.objects.filter(
-        start_date__lte=now,
-        end_date__gt=now,
-        is_active=False
-    ).order_by("start_date")
-
-    for candidate in candidates.select_related("user"):
-        user = candidate.user
-
-        with transaction.atomic():
-            active_exists = (
-                UserSubscription.objects
-                .select_for_update()
-                .filter(user=user, is_active=True)
-                .exists()
-            )
-
-            if not active_exists:
-                candidate.is_active = True
-                candidate.save()
+@shared_task
+def aggregate_subscription_shards(results, now):
+    totals = {
+        "now": now,
+        "shards": len(results),
+        "deactivated": sum(r["deactivated"] for r in results),
+        "activated": sum(r["activated"] for r in results),
+        "batches": sum(r["batches"] for r in results),
+        "shard_seconds_total": round(sum(r["total_seconds"] for r in results), 3),
+        "shard_seconds_max": max((r["total_seconds"] for r in results), default=0),
+        "elapsed_seconds": round(
+            (timezone.now() - datetime.fromisoformat(now)).total_seconds(), 3
+        ),
+    }
+    logger.info("Scheduled subscriptions processed: %s", totals)
+    return totals
+
+
+@shared_task
+def process_due_subscription_timers():
+    """
+    Apply only the transitions whose start_date / end_date has been reached,
+    as registered in the Redis timer index. Runs every few seconds, so
+    plans switch within seconds instead of at the next hourly run.
+    """
+    now = timezone.now()
+    batch_size = settings.SUBSCRIPTION_TIMER_BATCH_SIZE
+    totals = {"entries": 0, "users": 0, "deactivated": 0, "activated": 0}
+
+    while True:
+        entries = pop_due_timers(now, batch_size)
+        if not entries:
+            break
+
+        user_ids = {int(member.split(":", 1)[0]) for member in entries}
+        try:
+            stats = run_scheduler(now, Q(user_id__in=user_ids))
+        except Exception:
+            # Put the entries back so the next run retries them.
+            restore_timers(entries)
+            raise
+
+        totals["entries"] += len(entries)
+        totals["users"] += len(user_ids)
+        totals["deactivated"] += stats["deactivated"]
+        totals["activated"] += stats["activated"]
+
+        if len(entries) < batch_size:
+            break
+
+    return totals
+
+
+@shared_task
+def rebuild_subscription_timers():
+    """Reconcile the Redis timer index with Postgres."""
+    return {"registered": rebuild_timer_index(timezone.now())}
@@ -0,0 +1,91 @@
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from .models import UserSubscription
+from .scheduler import due_filter
+
+TIMERS_KEY = "subscriptions:timers"
+
+# Atomically take up to ARGV[2] members whose score is <= ARGV[1].
+_POP_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def timer_entries(subscription_id, user_id, start_date, end_date, is_active):
+    """
+    Sorted-set members for the transitions a subscription still has to go
+    through: its start while queued and its end. Members carry the user id
+    so due entries can be applied without looking the row up first.
+    """
+    entries = {f"{user_id}:{subscription_id}:end": end_date.timestamp()}
+    if not is_active:
+        entries[f"{user_id}:{subscription_id}:start"] = start_date.timestamp()
+    return entries
+
+
+def register_subscription_timers(subscriptions):
+    pipe = _redis().pipeline(transaction=False)
+    for sub in subscriptions:
+        pipe.zrem(TIMERS_KEY, f"{sub.user_id}:{sub.id}:start")
+        pipe.zadd(TIMERS_KEY, timer_entries(
+            sub.id, sub.user_id, sub.start_date, sub.end_date, sub.is_active
+        ))
+    pipe.execute()
+
+
+def remove_subscription_timers(subscription_id, user_id):
+    _redis().zrem(
+        TIMERS_KEY,
+        f"{user_id}:{subscription_id}:start",
+        f"{user_id}:{subscription_id}:end",
+    )
+
+
+def pop_due_timers(now, limit):
+    """Remove and return ``{member: score}`` for up to ``limit`` due entries."""
+    client = _redis()
+    script = client.register_script(_POP_DUE)
+    raw = script(keys=[TIMERS_KEY], args=[now.timestamp(), limit])
+    return {
+        raw[i].decode(): float(raw[i + 1])
+        for i in range(0, len(raw), 2)
+    }
+
+
+def restore_timers(entries):
+    if entries:
+        _redis().zadd(TIMERS_KEY, entries)
+
+
+def rebuild_timer_index(now, chunk_size=5000):
+    """
+    Re-register every pending transition from Postgres. Entries are upserted
+    into the live index rather than swapped in, so registrations made while
+    the rebuild runs are never lost.
+    """
+    client = _redis()
+    rows = (
+        UserSubscription.objects
+        .filter(Q(end_date__gt=now) | due_filter(now))
+        .values_list("id", "user_id", "start_date", "end_date", "is_active")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    count = 0
+    pipe = client.pipeline(transaction=False)
+    for row in rows:
+        pipe.zadd(TIMERS_KEY, timer_entries(*row))
+        count += 1
+        if count % chunk_size == 0:
+            pipe.execute()
+    pipe.execute()
+    return count
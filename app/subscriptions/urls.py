@@ -1,14 +1,24 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     SubscriptionTypeListView,
     MySubscriptionView,
     PurchaseSubscriptionView,
-    SubscriptionHistoryView
+    SubscriptionHistoryView,
+    BatchQuoteView,
 )
 
+if settings.ASYNC_VIEWS:
+    from .async_views import (  # noqa: F811
+        SubscriptionTypeListView,
+        MySubscriptionView,
+        SubscriptionHistoryView,
+    )
+
 urlpatterns = [
     path("plans/", SubscriptionTypeListView.as_view(), name="subscription-types"),
     path("me/", MySubscriptionView.as_view(), name="my-subscription"),
 #    path("purchase/", PurchaseSubscriptionView.as_view(), name="purchase-subscription"),
     path("history/", SubscriptionHistoryView.as_view(), name="subscription-history"),
+    path("quotes/", BatchQuoteView.as_view(), name="subscription-quotes"),
 ]
@@ -1,19 +1,40 @@
 from datetime import timedelta
 from drf_yasg.utils import swagger_auto_schema
+from django.conf import settings
+from django.db.models import Case, CharField, Value, When
 from django.utils import timezone
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import generics, status
 
-from .models import SubscriptionType, UserSubscription
+from .cache import (
+    get_my_subscription,
+    get_plans_preview,
+    seconds_until,
+    seconds_until_day_boundary,
+    set_my_subscription,
+    set_plans_preview,
+)
+from .catalog import attach_plans, get_catalog
+from .fast_serializers import (
+    VALUES_FIELDS,
+    serialize_subscription_row,
+    serialize_subscription_rows,
+)
+from .locks import user_subscription_lock
+from .models import UserSubscription
+from .pagination import SubscriptionHistoryPagination
+from .pricing import current_subscription, queued_subscription, quote_plans, quote_users
 from .serializers import (
     SubscriptionTypeSerializer,
     UserSubscriptionSerializer,
     PurchaseSubscriptionSerializer,
-    UserSubscriptionHistorySerializer
+    BatchQuoteSerializer,
 )
 
+HISTORY_BUCKETS = ("active", "past", "future")
+
 
 class SubscriptionTypeListView(APIView):
     """
@@ -24,61 +45,32 @@ class SubscriptionTypeListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        types = SubscriptionType.objects.all()
+        catalog = get_catalog()
+        types = catalog.all()
         user = request.user
 
         if not user.is_authenticated:
             return Response(SubscriptionTypeSerializer(types, many=True).data)
 
-        now = timezone.now()
-
-        current = (
-            UserSubscription.objects.filter(user=user, is_active=True)
-            .order_by("-start_date")
-            .first()
-        )
-
-        remaining_value = 0
-        remaining_days = 0
-        current_name = None
-
-        if current and current.end_date > now:
-            current_name = current.subscription_type.name
-
-            remaining_days = (current.end_date - now).days
-            if remaining_days > 0:
-                daily_price = current.subscription_type.monthly_price / 30
-                remaining_value = daily_price * remaining_days
+        cached = get_plans_preview(user.id, catalog.version)
+        if cached is not None:
+            return Response(cached)
 
-        enhanced = []
+        now = timezone.now()
 
-        for t in types:
-            discount = 0
-            final_price = t.monthly_price
+        current = current_subscription(user.id)
+        queued = queued_subscription(user.id, now)
+        attach_plans([s for s in (current, queued) if s], catalog)
 
-            if current and t.id != current.subscription_type.id:
-                
-                if t.monthly_price >= current.subscription_type.monthly_price:
-                    discount = remaining_value
-                    final_price = max(t.monthly_price - remaining_value, 0)
+        quotes = quote_plans(current, queued, types, now)
+        payload = quotes.preview()
 
-            enhanced.append({
-                "id": t.id,
-                "name": t.name,
-                "monthly_price": t.monthly_price,
-                "storage_limit_gb": t.storage_limit_gb,
-                "has_premium_features": t.has_premium_features,
-                "discount": round(discount, 2),
-                "final_price": round(final_price, 2),
-            })
+        timeout = settings.SUBSCRIPTION_CACHE_TIMEOUT
+        if quotes.current_plan:
+            timeout = seconds_until_day_boundary(current.end_date, now)
+        set_plans_preview(user.id, catalog.version, payload, timeout)
 
-
-        return Response({
-            "current_subscription": current_name,
-            "remaining_days": remaining_days,
-            "remaining_value": round(remaining_value, 2),
-            "subscription_types": enhanced
-        })
+        return Response(payload)
 
 
 
@@ -87,16 +79,28 @@ class MySubscriptionView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        subscription = (
+        catalog = get_catalog()
+        cached = get_my_subscription(request.user.id, catalog.version)
+        if cached is not None:
+            return Response(cached)
+
+        row = (
             UserSubscription.objects.filter(user=request.user, is_active=True)
             .order_by("-start_date")
+            .values(*VALUES_FIELDS)
             .first()
         )
 
-        if not subscription:
-            return Response({"detail": "No active subscription."})
+        timeout = settings.SUBSCRIPTION_CACHE_TIMEOUT
+        if not row:
+            payload = {"detail": "No active subscription."}
+        else:
+            payload = serialize_subscription_row(row, catalog)
+            timeout = seconds_until(row["end_date"], timezone.now())
 
-        return Response(UserSubscriptionSerializer(subscription).data)
+        if timeout:
+            set_my_subscription(request.user.id, catalog.version, payload, timeout)
+        return Response(payload)
 
 
 class PurchaseSubscriptionView(APIView):
@@ -109,20 +113,18 @@ class PurchaseSubscriptionView(APIView):
         serializer.is_valid(raise_exception=True)
 
         new_type = serializer.validated_data["subscription_type"]
-        user = request.user
-        now = timezone.now()
 
-        current = (
-            UserSubscription.objects.filter(user=user, is_active=True)
-            .order_by("-start_date")
-            .first()
-        )
+        # Reads and writes below must not interleave with another purchase,
+        # a webhook or the scheduler for the same user.
+        with user_subscription_lock(request.user.id):
+            return self.purchase(request.user, new_type)
 
-        future = (
-            UserSubscription.objects.filter(user=user, start_date__gt=now)
-            .order_by("start_date")
-            .first()
-        )
+    def purchase(self, user, new_type):
+        now = timezone.now()
+
+        current = current_subscription(user.id)
+        future = queued_subscription(user.id, now)
+        attach_plans([s for s in (current, future) if s])
 
         if not current:
             new_sub = UserSubscription.objects.create(
@@ -137,7 +139,7 @@ class PurchaseSubscriptionView(APIView):
         if future:
             if (
                 new_type.monthly_price > current.subscription_type.monthly_price and
-                future.subscription_type.id == current.subscription_type.id
+                future.subscription_type_id == current.subscription_type_id
             ):
                 pass
             else:
@@ -146,7 +148,7 @@ class PurchaseSubscriptionView(APIView):
                     status=400
                 )
 
-        if current.subscription_type.id == new_type.id:
+        if current.subscription_type_id == new_type.id:
             start = current.end_date
             end = start + timedelta(days=30)
 
@@ -183,15 +185,9 @@ class PurchaseSubscriptionView(APIView):
                 "subscription": UserSubscriptionSerializer(new_sub).data
             }, status=201)
 
-        if future and is_upgrade:
-            basic_price = current.subscription_type.monthly_price
-
-            full_remaining_days = (future.end_date - now).days
-            daily_basic = basic_price / 30
-
-            full_remaining_value = full_remaining_days * daily_basic
-            final_price = new_type.monthly_price + full_remaining_value
+        quote = quote_plans(current, future, [new_type], now).plans[new_type.id]
 
+        if future and is_upgrade:
             current.is_active = False
             current.save()
             future.delete()
@@ -206,22 +202,14 @@ class PurchaseSubscriptionView(APIView):
 
             return Response({
                 "detail": "Upgraded across both queued periods.",
-                "full_gap_charge": round(full_remaining_value, 2),
-                "final_price": round(final_price, 2),
+                "full_gap_charge": quote.gap_charge,
+                "final_price": quote.final_price,
                 "subscription": UserSubscriptionSerializer(new_sub).data
             }, status=201)
 
         current.is_active = False
         current.save()
 
-        remaining_days = (current.end_date - now).days
-        remaining_value = 0
-        if remaining_days > 0:
-            daily_price = current.subscription_type.monthly_price / 30
-            remaining_value = float(daily_price * remaining_days)
-
-        final_price = max(float(new_type.monthly_price) - remaining_value, 0)
-
         new_sub = UserSubscription.objects.create(
             user=user,
             subscription_type=new_type,
@@ -232,34 +220,118 @@ class PurchaseSubscriptionView(APIView):
 
         return Response({
             "detail": "Upgraded successfully.",
-            "discount_applied": round(remaining_value, 2),
-            "final_price": round(final_price, 2),
+            "discount_applied": quote.discount,
+            "final_price": quote.final_price,
             "subscription": UserSubscriptionSerializer(new_sub).data
         }, status=201)
 
+def history_queryset(user, now):
+    """The user's subscriptions as VALUES_FIELDS rows plus their ``bucket``."""
+    return UserSubscription.objects.filter(user=user).annotate(
+        bucket=Case(
+            When(
+                is_active=True,
+                start_date__lte=now,
+                end_date__gte=now,
+                then=Value("active"),
+            ),
+            When(start_date__gt=now, then=Value("future")),
+            default=Value("past"),
+            output_field=CharField(),
+        )
+    ).values(*VALUES_FIELDS, "bucket")
+
+
+def history_pages(request, view, subs, bucket, catalog):
+    """
+    Response data of the history endpoint: every subscription split into
+    the three buckets, or with ``?bucket=`` one cursor-paginated bucket.
+    """
+    if bucket is not None:
+        paginator = SubscriptionHistoryPagination()
+        page = paginator.paginate_queryset(subs.filter(bucket=bucket), request, view=view)
+        return paginator.get_paginated_response(
+            serialize_subscription_rows(page, catalog)
+        ).data
+
+    # The original, unpaginated shape: existing clients rely on it.
+    rows = {name: [] for name in HISTORY_BUCKETS}
+    for row in subs.order_by("-start_date"):
+        rows[row["bucket"]].append(row)
+    return {name: serialize_subscription_rows(rows[name], catalog) for name in HISTORY_BUCKETS}
+
+
+def history_params_error(params):
+    """The 400 message for bad history query params, or None."""
+    bucket = params.get("bucket")
+    if bucket is None:
+        # A cursor only makes sense within the bucket it was issued for.
+        if "cursor" in params:
+            return "cursor requires bucket."
+        return None
+    if bucket not in HISTORY_BUCKETS:
+        return f"bucket must be one of: {', '.join(HISTORY_BUCKETS)}."
+    return None
+
+
 class SubscriptionHistoryView(APIView):
+    """
+    Subscriptions split into the ``active``, ``past`` and ``future`` buckets,
+    classified in SQL.
+
+    ``?bucket=`` opts into a cursor-paginated response for that bucket
+    alone; without it every subscription is returned, as before.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        now = timezone.now()
+        catalog = get_catalog()
+        error = history_params_error(request.query_params)
+        if error:
+            return Response({"detail": error}, status=400)
 
-        subs = UserSubscription.objects.filter(user=user).order_by("-start_date")
+        subs = history_queryset(request.user, timezone.now())
+        bucket = request.query_params.get("bucket")
+        return Response(history_pages(request, self, subs, bucket, catalog))
 
-        active = []
-        past = []
-        future = []
 
-        for s in subs:
-            if s.start_date <= now <= s.end_date and s.is_active:
-                active.append(s)
-            elif s.start_date > now:
-                future.append(s)
-            else:
-                past.append(s)
+class BatchQuoteView(APIView):
+    """
+    Staff endpoint: plan quotes for many users at once (price-change impact
+    runs), computed with two bulk queries instead of one preview per user.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(request_body=BatchQuoteSerializer)
+    def post(self, request):
+        serializer = BatchQuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        plans = None
+        if "subscription_type_ids" in serializer.validated_data:
+            catalog = get_catalog()
+            plans = [catalog.get(i) for i in serializer.validated_data["subscription_type_ids"]]
+
+        now = timezone.now()
+        quotes = quote_users(serializer.validated_data["user_ids"], now, plans)
 
         return Response({
-            "active": UserSubscriptionHistorySerializer(active, many=True).data,
-            "past": UserSubscriptionHistorySerializer(past, many=True).data,
-            "future": UserSubscriptionHistorySerializer(future, many=True).data,
+            "quoted_at": now,
+            "quotes": [
+                {
+                    "user_id": user_id,
+                    "current_subscription": q.current_plan.id if q.current_plan else None,
+                    "remaining_days": q.remaining_days,
+                    "subscription_types": [
+                        {
+                            "id": plan_id,
+                            "discount": quote.discount,
+                            "gap_charge": quote.gap_charge,
+                            "final_price": quote.final_price,
+                        }
+                        for plan_id, quote in q.plans.items()
+                    ],
+                }
+                for user_id, q in quotes.items()
+            ],
         })